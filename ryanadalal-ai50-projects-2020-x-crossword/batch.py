@@ -0,0 +1,145 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+from collections import Counter
+from crossword import *
+from generate import CrosswordCreator
+
+# Vocabulary index shared by every puzzle a worker process solves
+index = None
+
+
+def structure_files(source):
+    """
+    Return the structure files named by `source`: every .txt file in it if
+    it is a directory, or else every non-empty line of it as a manifest
+    (relative paths are taken from the manifest's own directory).
+    """
+    if os.path.isdir(source):
+        return [
+            os.path.join(source, name)
+            for name in sorted(os.listdir(source))
+            if name.endswith(".txt")
+        ]
+    base = os.path.dirname(source)
+    with open(source) as f:
+        return [
+            os.path.join(base, line.strip())
+            for line in f
+            if line.strip() and not line.startswith("#")
+        ]
+
+
+def load_index(shared):
+    """
+    Pool initializer: keep the vocabulary index loaded by the parent.
+    """
+    global index
+    index = shared
+
+
+def generate_one(task):
+    """
+    Solve one structure and write its text grid (and PNG if asked) to the
+    output directory. Return a dict describing the outcome.
+    """
+    structure, options = task
+    name = os.path.splitext(os.path.basename(structure))[0]
+    result = {"structure": structure, "status": "failed"}
+    start = time.monotonic()
+    try:
+        crossword = Crossword(structure, None, index=index)
+        creator = CrosswordCreator(crossword, engine=options["engine"])
+        assignment = creator.solve(
+            inference=options["inference"], timeout=options["timeout"]
+        )
+        result["nodes"] = creator.stats["nodes"]
+        if assignment is not None:
+            result["status"] = "solved"
+            output = os.path.join(options["output"], name)
+            with open(f"{output}.txt", "w") as f:
+                f.write(creator.text(assignment))
+            if options["png"]:
+                creator.save(assignment, f"{output}.png")
+    except TimeoutError:
+        result["status"] = "timeout"
+    except Exception as e:
+        result["status"] = "error"
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["seconds"] = round(time.monotonic() - start, 3)
+    return result
+
+
+def main():
+
+    parser = argparse.ArgumentParser(
+        description="Generate crosswords for many structures at once."
+    )
+    parser.add_argument("structures",
+                        help="directory of structure files, or a manifest "
+                             "listing one structure file per line")
+    parser.add_argument("words")
+    parser.add_argument("output", help="directory to write puzzles to")
+    parser.add_argument("--png", action="store_true",
+                        help="also save each puzzle as a PNG image")
+    parser.add_argument("--engine", choices=CrosswordCreator.ENGINES,
+                        default="bitset")
+    parser.add_argument("--inference", choices=CrosswordCreator.INFERENCES,
+                        default="forward-checking")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="number of puzzles solved in parallel")
+    parser.add_argument("--timeout", type=float,
+                        help="give up on a puzzle after this many seconds")
+    args = parser.parse_args()
+
+    structures = structure_files(args.structures)
+    os.makedirs(args.output, exist_ok=True)
+    options = dict(
+        engine=args.engine, inference=args.inference,
+        timeout=args.timeout, output=args.output, png=args.png
+    )
+
+    # Load and index the vocabulary once, for every worker
+    start = time.monotonic()
+    shared = WordIndex.load(args.words)
+    shared.vocabulary()
+
+    results = []
+    with multiprocessing.Pool(
+        args.workers, initializer=load_index, initargs=(shared,)
+    ) as pool:
+        tasks = [(structure, options) for structure in structures]
+        for result in pool.imap_unordered(generate_one, tasks):
+            results.append(result)
+            line = f"{result['status']}: {result['structure']} " \
+                   f"({result['seconds']} s)"
+            if "error" in result:
+                line += f" {result['error']}"
+            print(line, flush=True)
+
+    # Summary report
+    counts = Counter(result["status"] for result in results)
+    summary = {
+        "puzzles": len(results),
+        "solved": counts["solved"],
+        "failed": counts["failed"],
+        "timeout": counts["timeout"],
+        "error": counts["error"],
+        "seconds": round(time.monotonic() - start, 3),
+        "results": sorted(results, key=lambda result: result["structure"])
+    }
+    with open(os.path.join(args.output, "summary.json"), "w") as f:
+        json.dump(summary, f, indent=2)
+    print(f"{summary['solved']} solved, {summary['failed']} failed, "
+          f"{summary['timeout']} timed out, {summary['error']} errors "
+          f"in {summary['seconds']} s")
+    if counts["error"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+import argparse
+import csv
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import string
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from crossword import *
+from generate import CrosswordCreator
+
+
+FIELDS = [
+    "label", "structure", "words", "variables", "engine", "inference",
+    "backjumping", "status", "seconds", "nodes", "revisions", "peak_kib"
+]
+
+
+def random_grid(height, width, density, rng, symmetric=False):
+    """
+    Return a random structure (a list of rows of "_" and "#") in which each
+    square is black with probability `density`. If `symmetric` is True, the
+    grid is unchanged by a half turn, like a published crossword.
+    """
+    grid = [["_" for _ in range(width)] for _ in range(height)]
+    for i in range(height):
+        for j in range(width):
+            if symmetric and (i, j) > (height - 1 - i, width - 1 - j):
+                continue
+            if rng.random() < density:
+                grid[i][j] = "#"
+                if symmetric:
+                    grid[height - 1 - i][width - 1 - j] = "#"
+    return ["".join(row) for row in grid]
+
+
+def sample_words(source, size, rng):
+    """
+    Return `size` distinct words sampled from the list `source`, padded with
+    random words of common lengths if `source` is too small.
+    """
+    words = rng.sample(source, min(size, len(source)))
+    seen = set(words)
+    while len(words) < size:
+        word = "".join(
+            rng.choice(string.ascii_uppercase)
+            for _ in range(rng.randint(3, 8))
+        )
+        if word not in seen:
+            seen.add(word)
+            words.append(word)
+    return words
+
+
+def workloads(args, directory):
+    """
+    Write the grids and dictionaries described by `args` to `directory`
+    and return a list of (structure file, words file) pairs.
+    """
+    rng = random.Random(args.seed)
+    with open(args.words) as f:
+        source = sorted(set(f.read().upper().splitlines()) - {""})
+
+    dictionaries = []
+    for size in args.sizes:
+        path = os.path.join(directory, f"words{size}.txt")
+        with open(path, "w") as f:
+            f.write("\n".join(sample_words(source, size, rng)))
+        dictionaries.append(path)
+
+    structures = list(args.structures)
+    for n in range(args.grids):
+        kind = "symmetric" if args.symmetric else "random"
+        path = os.path.join(directory, f"{kind}{n}.txt")
+        grid = random_grid(
+            args.height, args.width, args.density, rng, args.symmetric
+        )
+        with open(path, "w") as f:
+            f.write("\n".join(grid))
+        structures.append(path)
+
+    return list(itertools.product(structures, dictionaries))
+
+
+def measure(crossword, settings, memory, results):
+    """
+    Solve `crossword` with `settings` and put a dict of measurements on the
+    `results` queue. Peak memory is taken from a second, traced run so that
+    tracing does not slow the timed one.
+    """
+    options = dict(settings)
+    inference = options.pop("inference")
+
+    creator = CrosswordCreator(crossword, **options)
+    start = time.perf_counter()
+    assignment = creator.solve(inference=inference)
+    seconds = time.perf_counter() - start
+
+    peak = None
+    if memory:
+        tracemalloc.start()
+        CrosswordCreator(crossword, **options).solve(inference=inference)
+        peak = tracemalloc.get_traced_memory()[1] // 1024
+        tracemalloc.stop()
+
+    results.put({
+        "status": "solved" if assignment is not None else "unsolvable",
+        "seconds": round(seconds, 6),
+        "nodes": creator.stats["nodes"],
+        "revisions": creator.stats["revisions"],
+        "peak_kib": peak
+    })
+
+
+def check(crossword, limit):
+    """
+    Return a list of the ways the bitset engine disagrees with the set
+    engine on `crossword`: the domains left by arc consistency, and for
+    each inference mode the solutions found (compared in full when there
+    are fewer than `limit` of them, and by count otherwise). Also report a
+    creator that counts a different number of solutions after it has
+    already solved the puzzle once.
+    """
+    problems = []
+    domains = dict()
+    for engine in CrosswordCreator.ENGINES:
+        creator = CrosswordCreator(crossword, engine=engine)
+        creator.enforce_node_consistency()
+        creator.ac3()
+        domains[engine] = {
+            var: set(creator.domains[var]) for var in crossword.variables
+        }
+    for var in crossword.variables:
+        if domains["set"][var] != domains["bitset"][var]:
+            problems.append(f"arc consistency differs at {var}")
+
+    for inference in CrosswordCreator.INFERENCES:
+        solutions = dict()
+        for engine in CrosswordCreator.ENGINES:
+            creator = CrosswordCreator(crossword, engine=engine)
+            solutions[engine] = set(
+                frozenset(assignment.items())
+                for assignment in creator.iter_solutions(limit, inference)
+            )
+            if len(solutions[engine]) < limit:
+                creator.solve(inference=inference)
+                count = creator.count_solutions(inference=inference)
+                if count != len(solutions[engine]):
+                    problems.append(
+                        f"{engine} {inference} counts {count} solutions "
+                        f"after solving, not {len(solutions[engine])}"
+                    )
+        found = [len(solutions[engine]) for engine in solutions]
+        if max(found) < limit:
+            same = solutions["set"] == solutions["bitset"]
+        else:
+            same = min(found) == limit
+        if not same:
+            problems.append(
+                f"{inference} solutions differ: {found[0]} set, "
+                f"{found[1]} bitset"
+            )
+    return problems
+
+
+def run(crossword, settings, timeout, memory):
+    """
+    Measure one solve in a child process, killing it after `timeout`
+    seconds, and return its measurements.
+    """
+    results = multiprocessing.Queue()
+    process = multiprocessing.Process(
+        target=measure, args=(crossword, settings, memory, results)
+    )
+    process.start()
+    process.join(timeout)
+    if process.is_alive():
+        process.terminate()
+        process.join()
+        return {"status": "timeout"}
+    if results.empty():
+        return {"status": "error"}
+    return results.get()
+
+
+def write(rows, filename):
+    """
+    Write result `rows` to `filename` as JSON if it ends in .json, and as
+    CSV otherwise.
+    """
+    if filename.endswith(".json"):
+        with open(filename, "w") as f:
+            json.dump(rows, f, indent=2)
+    else:
+        with open(filename, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+def main():
+
+    parser = argparse.ArgumentParser(
+        description="Benchmark CrosswordCreator.solve on generated grids."
+    )
+    parser.add_argument("--grids", type=int, default=3,
+                        help="number of grids to generate")
+    parser.add_argument("--height", type=int, default=7)
+    parser.add_argument("--width", type=int, default=7)
+    parser.add_argument("--density", type=float, default=0.3,
+                        help="probability that a square is black")
+    parser.add_argument("--symmetric", action="store_true",
+                        help="generate grids with half-turn symmetry")
+    parser.add_argument("--structures", nargs="*", default=[],
+                        metavar="FILE", help="extra structure files to run")
+    parser.add_argument("--words", default="data/words2.txt",
+                        help="vocabulary to sample dictionaries from")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[3000],
+                        help="dictionary sizes to sample")
+    parser.add_argument("--engines", nargs="+",
+                        default=list(CrosswordCreator.ENGINES),
+                        choices=CrosswordCreator.ENGINES)
+    parser.add_argument("--inferences", nargs="+",
+                        default=list(CrosswordCreator.INFERENCES),
+                        choices=CrosswordCreator.INFERENCES)
+    parser.add_argument("--no-backjumping", action="store_true",
+                        help="skip the backjumping runs")
+    parser.add_argument("--no-memory", action="store_true",
+                        help="skip the traced run that measures memory")
+    parser.add_argument("--timeout", type=float, default=60,
+                        help="seconds allowed for each solve")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--label", default="",
+                        help="tag stored with every result, e.g. a version")
+    parser.add_argument("--output", metavar="FILE",
+                        help="write results to FILE (.csv or .json)")
+    parser.add_argument("--check", type=int, nargs="?", const=1000,
+                        metavar="LIMIT",
+                        help="instead of timing, check that the bitset "
+                             "engine finds the same domains and solutions "
+                             "(up to LIMIT) as the set engine")
+    args = parser.parse_args()
+
+    if args.check:
+        failures = 0
+        with tempfile.TemporaryDirectory() as directory:
+            for structure, words in workloads(args, directory):
+                problems = check(Crossword(structure, words), args.check)
+                failures += bool(problems)
+                print(f"{os.path.basename(structure)}, "
+                      f"{os.path.basename(words)}: "
+                      f"{'; '.join(problems) or 'ok'}", flush=True)
+        sys.exit(1 if failures else 0)
+
+    backjumping = [False] if args.no_backjumping else [False, True]
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        for structure, words in workloads(args, directory):
+            crossword = Crossword(structure, words)
+            for engine, inference, jump in itertools.product(
+                args.engines, args.inferences, backjumping
+            ):
+                settings = dict(engine=engine, inference=inference,
+                                backjumping=jump)
+                row = {
+                    "label": args.label,
+                    "structure": os.path.basename(structure),
+                    "words": os.path.basename(words),
+                    "variables": len(crossword.variables),
+                    "engine": engine,
+                    "inference": inference,
+                    "backjumping": jump
+                }
+                row.update(run(
+                    crossword, settings, args.timeout, not args.no_memory
+                ))
+                rows.append(row)
+                print(", ".join(
+                    f"{field}={row.get(field)}" for field in FIELDS[1:]
+                ), flush=True)
+
+    if args.output:
+        write(rows, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,46 @@
+import os
+import pickle
+
+from array import array
+from collections.abc import Mapping
+
+
 class Variable():
 
     ACROSS = "across"
     DOWN = "down"
 
-    def __init__(self, i, j, direction, length):
-        """Create a new variable with starting point, direction, and length."""
+    __slots__ = ("i", "j", "direction", "length", "cells", "id", "hash")
+
+    def __init__(self, i, j, direction, length, id=None):
+        """
+        Create a new variable with starting point, direction, and length.
+        `id` is the variable's dense number within its Crossword.
+        """
         self.i = i
         self.j = j
         self.direction = direction
         self.length = length
-        self.cells = []
-        for k in range(self.length):
-            self.cells.append(
-                (self.i + (k if self.direction == Variable.DOWN else 0),
-                 self.j + (k if self.direction == Variable.ACROSS else 0))
-            )
+        self.cells = tuple(
+            (self.i + (k if self.direction == Variable.DOWN else 0),
+             self.j + (k if self.direction == Variable.ACROSS else 0))
+            for k in range(self.length)
+        )
+        self.id = id
+
+        # Hash integers only, so the hash is the same in every process
+        self.hash = hash(
+            (self.i, self.j, self.direction == Variable.ACROSS, self.length)
+        )
 
     def __hash__(self):
-        return hash((self.i, self.j, self.direction, self.length))
+        return self.hash
 
     def __eq__(self, other):
+        if self is other:
+            return True
+        if not isinstance(other, Variable):
+            return NotImplemented
         return (
             (self.i == other.i) and
             (self.j == other.j) and
@@ -37,7 +58,12 @@ class Variable():
 
 class Crossword():
 
-    def __init__(self, structure_file, words_file):
+    def __init__(self, structure_file, words_file, index=None):
+        """
+        Load a crossword from its structure and vocabulary files. If a
+        WordIndex is passed as `index`, it is used instead of `words_file`
+        so that many puzzles can share one vocabulary.
+        """
 
         # Determine structure of crossword
         with open(structure_file) as f:
@@ -57,9 +83,9 @@ class Crossword():
                         row.append(False)
                 self.structure.append(row)
 
-        # Save vocabulary list
-        with open(words_file) as f:
-            self.words = set(f.read().upper().splitlines())
+        # Save vocabulary list, indexed by (length, position, letter)
+        self.index = index if index is not None else WordIndex.load(words_file)
+        self.words = self.index.vocabulary()
 
         # Determine variable set
         self.variables = set()
@@ -104,30 +130,349 @@ class Crossword():
                             length=length
                         ))
 
+        # Number the variables in grid order
+        self.order = tuple(sorted(
+            self.variables, key=lambda v: (v.i, v.j, v.direction)
+        ))
+        self.ids = dict()
+        for n, var in enumerate(self.order):
+            var.id = n
+            self.ids[var] = n
+
         # Compute overlaps for each word
         # For any pair of variables v1, v2, their overlap is either:
         #    None, if the two variables do not overlap; or
         #    (i, j), where v1's ith character overlaps v2's jth character
-        self.overlaps = dict()
-        for v1 in self.variables:
-            for v2 in self.variables:
-                if v1 == v2:
-                    continue
-                cells1 = v1.cells
-                cells2 = v2.cells
-                intersection = set(cells1).intersection(cells2)
-                if not intersection:
-                    self.overlaps[v1, v2] = None
-                else:
-                    intersection = intersection.pop()
-                    self.overlaps[v1, v2] = (
-                        cells1.index(intersection),
-                        cells2.index(intersection)
+        # The overlap of variables numbered a and b is stored at
+        # overlap_matrix[2 * (a * n + b)] and the entry after it, as -1 for
+        # None; `overlaps` is a dict-like view keyed by pairs of variables
+        count = len(self.order)
+        self.overlap_matrix = array("i", [-1]) * (2 * count * count)
+        covering = dict()
+        for var in self.order:
+            for k, cell in enumerate(var.cells):
+                covering.setdefault(cell, []).append((var.id, k))
+        for pairs in covering.values():
+            for a, k1 in pairs:
+                for b, k2 in pairs:
+                    if a != b:
+                        self.overlap_matrix[2 * (a * count + b)] = k1
+                        self.overlap_matrix[2 * (a * count + b) + 1] = k2
+        self.overlaps = OverlapView(self)
+
+        # Precompute adjacency once. The neighbors of variable n are stored,
+        # CSR style, in neighbor_ids[neighbor_offsets[n]:neighbor_offsets[n
+        # + 1]], with the matching overlap pairs in overlap_first and
+        # overlap_second
+        self.neighbor_offsets = array("i", [0])
+        self.neighbor_ids = array("i")
+        self.overlap_first = array("i")
+        self.overlap_second = array("i")
+        for a in range(count):
+            for b in range(count):
+                first = self.overlap_matrix[2 * (a * count + b)]
+                if first != -1:
+                    self.neighbor_ids.append(b)
+                    self.overlap_first.append(first)
+                    self.overlap_second.append(
+                        self.overlap_matrix[2 * (a * count + b) + 1]
                     )
+            self.neighbor_offsets.append(len(self.neighbor_ids))
+
+        # Variable-keyed views of the same tables: `adjacent` maps each
+        # variable to its (neighbor, overlap) pairs, `arcs` lists every
+        # ordered pair of overlapping variables
+        self.adjacent = dict()
+        self.arcs = []
+        for n, var in enumerate(self.order):
+            pairs = []
+            for k in range(self.neighbor_offsets[n],
+                           self.neighbor_offsets[n + 1]):
+                other = self.order[self.neighbor_ids[k]]
+                pairs.append(
+                    (other, (self.overlap_first[k], self.overlap_second[k]))
+                )
+                self.arcs.append((var, other))
+            self.adjacent[var] = tuple(pairs)
+        self.arcs = tuple(self.arcs)
+
+    def overlap(self, v1, v2):
+        """
+        Return the overlap of two variables of this crossword: None, or
+        (i, j) where v1's ith character overlaps v2's jth character.
+        """
+        count = len(self.order)
+        k = 2 * (self.number(v1) * count + self.number(v2))
+        if self.overlap_matrix[k] == -1:
+            return None
+        return (self.overlap_matrix[k], self.overlap_matrix[k + 1])
+
+    def number(self, var):
+        """Return the dense id of `var` within this crossword."""
+        if var.id is not None and var.id < len(self.order) \
+                and self.order[var.id] is var:
+            return var.id
+        return self.ids[var]
 
     def neighbors(self, var):
         """Given a variable, return set of overlapping variables."""
-        return set(
-            v for v in self.variables
-            if v != var and self.overlaps[v, var]
-        )
+        return set(other for other, _ in self.adjacent[var])
+
+    def components(self, same_length=False):
+        """
+        Split the variables into lists of variables connected by overlaps,
+        each in grid order. If `same_length` is True, variables of equal
+        length are connected too, since they may compete for the same word.
+        """
+        by_length = dict()
+        for var in self.order:
+            by_length.setdefault(var.length, []).append(var)
+
+        components = []
+        seen = set()
+        for var in self.order:
+            if var in seen:
+                continue
+            seen.add(var)
+            component = []
+            stack = [var]
+            while stack:
+                current = stack.pop()
+                component.append(current)
+                linked = [other for other, _ in self.adjacent[current]]
+                if same_length:
+                    linked.extend(by_length[current.length])
+                for other in linked:
+                    if other not in seen:
+                        seen.add(other)
+                        stack.append(other)
+            components.append(sorted(component, key=self.ids.get))
+        return components
+
+
+class OverlapView(Mapping):
+
+    def __init__(self, crossword):
+        """
+        Present the overlap matrix of `crossword` as the dict it used to
+        be: keyed by every pair of distinct variables, with values None or
+        (i, j).
+        """
+        self.crossword = crossword
+
+    def __getitem__(self, pair):
+        v1, v2 = pair
+        if v1 == v2:
+            raise KeyError(pair)
+        return self.crossword.overlap(v1, v2)
+
+    def __iter__(self):
+        for v1 in self.crossword.order:
+            for v2 in self.crossword.order:
+                if v1 is not v2:
+                    yield v1, v2
+
+    def __len__(self):
+        count = len(self.crossword.order)
+        return count * (count - 1)
+
+
+class WordIndex():
+
+    # Bumped whenever the layout of the on-disk cache changes
+    VERSION = 2
+
+    def __init__(self, words):
+        """
+        Number the words of each length and precompute, for each length,
+        a `(position, letter) -> bitset` table over those numbers.
+        """
+        by_length = dict()
+        for word in sorted(words):
+            by_length.setdefault(len(word), []).append(word)
+
+        # words[length] is the list of words, bits[length] maps a word to
+        # its bit, and letters[length][k][letter] is the bitset of words
+        # with `letter` at position k
+        self.words = dict()
+        self.bits = dict()
+        self.letters = dict()
+        self.all_words = None
+        for length, group in by_length.items():
+            self.words[length] = group
+            self.bits[length] = {word: n for n, word in enumerate(group)}
+            members = [dict() for _ in range(length)]
+            for n, word in enumerate(group):
+                for k, letter in enumerate(word):
+                    members[k].setdefault(letter, []).append(n)
+            size = (len(group) + 7) // 8
+            self.letters[length] = [
+                {letter: bitset(bits, size) for letter, bits in table.items()}
+                for table in members
+            ]
+
+    @classmethod
+    def load(cls, words_file):
+        """
+        Return the index for `words_file`, reading it from the cache file
+        next to it when that was built from the current file, and building
+        and caching it otherwise.
+
+        The cache holds two pickles: a small (version, size, mtime) header,
+        checked before the index itself is read, and the index.
+        """
+        cache_file = f"{words_file}.wordindex"
+        info = os.stat(words_file)
+        source = (cls.VERSION, info.st_size, info.st_mtime_ns)
+        try:
+            with open(cache_file, "rb") as f:
+                if pickle.load(f) == source:
+                    return pickle.load(f)
+        except Exception:
+            # A missing, truncated or foreign cache is simply rebuilt
+            pass
+
+        with open(words_file) as f:
+            index = cls(set(f.read().upper().splitlines()))
+
+        # Write to a temporary file first so a reader never sees half a cache
+        try:
+            with open(f"{cache_file}.tmp", "wb") as f:
+                pickle.dump(source, f, pickle.HIGHEST_PROTOCOL)
+                pickle.dump(index, f, pickle.HIGHEST_PROTOCOL)
+            os.replace(f"{cache_file}.tmp", cache_file)
+        except OSError:
+            pass
+        return index
+
+    def __getstate__(self):
+        return {"words": self.words, "letters": self.letters}
+
+    def __setstate__(self, state):
+        self.words = state["words"]
+        self.letters = state["letters"]
+        self.all_words = None
+        self.bits = {
+            length: {word: n for n, word in enumerate(group)}
+            for length, group in self.words.items()
+        }
+
+    def vocabulary(self):
+        """
+        Return the set of every indexed word. The set is built once and
+        shared, so callers must copy it before changing it.
+        """
+        if self.all_words is None:
+            self.all_words = set(
+                word for group in self.words.values() for word in group
+            )
+        return self.all_words
+
+    def matching(self, length, position, letter):
+        """
+        Return the bitset of words of `length` with `letter` at `position`.
+        """
+        return self.table(length, position).get(letter, 0)
+
+    def words_matching(self, length, position, letter):
+        """
+        Return the words of `length` with `letter` at `position`.
+        """
+        return self.decode(length, self.matching(length, position, letter))
+
+    def match(self, pattern):
+        """
+        Return the words fitting `pattern`, in which "_" stands for any
+        letter (e.g. "_A__E").
+        """
+        pattern = pattern.upper()
+        mask = self.full(len(pattern))
+        for k, letter in enumerate(pattern):
+            if letter != "_":
+                mask &= self.matching(len(pattern), k, letter)
+        return self.decode(len(pattern), mask)
+
+    def full(self, length):
+        """Return the bitset of every word with the given length."""
+        return (1 << len(self.words.get(length, ()))) - 1
+
+    def table(self, length, position):
+        """Return the `letter -> bitset` table for a length and position."""
+        tables = self.letters.get(length, ())
+        return tables[position] if position < len(tables) else dict()
+
+    def bit(self, word):
+        """Return the bit number of `word`, or None if it is not indexed."""
+        return self.bits.get(len(word), dict()).get(word)
+
+    def decode(self, length, mask):
+        """Return the list of words of the given length set in `mask`."""
+        group = self.words.get(length, ())
+        bits = bin(mask)[:1:-1]
+        words = []
+        n = bits.find("1")
+        while n != -1:
+            words.append(group[n])
+            n = bits.find("1", n + 1)
+        return words
+
+
+class BitsetDomain():
+
+    def __init__(self, index, length, mask=None):
+        """Create a domain of words of `length`, stored as a bitset."""
+        self.index = index
+        self.length = length
+        self.mask = index.full(length) if mask is None else mask
+
+    def __len__(self):
+        return self.mask.bit_count()
+
+    def __iter__(self):
+        return iter(self.index.decode(self.length, self.mask))
+
+    def __contains__(self, word):
+        bit = self.index.bit(word)
+        return bit is not None and len(word) == self.length \
+            and bool(self.mask >> bit & 1)
+
+    def __eq__(self, other):
+        if isinstance(other, BitsetDomain):
+            return self.length == other.length and self.mask == other.mask
+        return set(self) == other
+
+    def __repr__(self):
+        return f"BitsetDomain({self.length}, {len(self)} words)"
+
+    def add(self, word):
+        bit = self.index.bit(word)
+        if bit is None or len(word) != self.length:
+            raise ValueError(f"{word} cannot be stored in this domain")
+        self.mask |= 1 << bit
+
+    def update(self, words):
+        if isinstance(words, BitsetDomain):
+            self.mask |= words.mask
+            return
+        for word in words:
+            self.add(word)
+
+    def discard(self, word):
+        if word in self:
+            self.mask &= ~(1 << self.index.bit(word))
+
+    def remove(self, word):
+        if word not in self:
+            raise KeyError(word)
+        self.mask &= ~(1 << self.index.bit(word))
+
+    def copy(self):
+        return BitsetDomain(self.index, self.length, self.mask)
+
+
+def bitset(bits, size):
+    """Return an integer with each bit number in `bits` set."""
+    data = bytearray(size)
+    for n in bits:
+        data[n >> 3] |= 1 << (n & 7)
+    return int.from_bytes(data, "little")
@@ -1,19 +1,91 @@
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import random
 import sys
+import time
 
+from collections import Counter, OrderedDict, deque
 from crossword import *
 
 
 class CrosswordCreator():
 
-    def __init__(self, crossword):
+    ENGINES = ("set", "bitset")
+    INFERENCES = ("none", "forward-checking", "mac")
+
+    def __init__(self, crossword, engine="set", seed=None,
+                 backjumping=False, nogood_limit=0):
         """
         Create new CSP crossword generate.
+
+        `engine` selects how domains are stored: "set" keeps a set of words
+        per variable, "bitset" keeps a bitset over `crossword.index` so arc
+        revision is a few bitwise ANDs per letter.
+
+        If `seed` is given, ties between variables and between values are
+        broken in a random order drawn from it.
+
+        If `backjumping` is True, `backtrack` uses conflict-directed
+        backjumping, and remembers up to `nogood_limit` partial assignments
+        proven to fail.
         """
+        if engine not in CrosswordCreator.ENGINES:
+            raise ValueError(f"unknown domain engine: {engine}")
         self.crossword = crossword
-        self.domains = {
-            var: self.crossword.words.copy()
-            for var in self.crossword.variables
-        }
+        self.engine = engine
+
+        # Order in which variables are considered, which breaks MRV ties
+        self.seed = seed
+        self.random = None if seed is None else random.Random(seed)
+        self.variables = self.crossword.variables
+        if self.random is not None:
+            self.variables = sorted(
+                self.variables, key=lambda var: self.crossword.ids[var]
+            )
+            self.random.shuffle(self.variables)
+
+        # Conflict-directed backjumping, and the nogoods it has learned: an
+        # LRU map from each frozenset of (variable, word) pairs to None, plus
+        # an index from each pair to the nogoods containing it
+        self.backjumping = backjumping
+        self.nogood_limit = nogood_limit
+        self.nogoods = OrderedDict()
+        self.nogood_index = dict()
+
+        # Inference run after each assignment during search, and the trail of
+        # (variable, removed values) pairs used to undo it on backtracking
+        self.inference = "none"
+        self.trail = None
+        self.wiped_out = None
+
+        # time.monotonic() value after which search raises TimeoutError
+        self.deadline = None
+
+        # Residual supports: the last support found for each (x, value of x,
+        # y), tried first the next time the arc is revised (AC-3rm). Unlike
+        # AC-2001 the scan does not resume after it, so nothing needs undoing
+        # on backtracking. Holds at most one entry per arc and value, and is
+        # emptied at the start of each run. Also counters of the work done
+        # and saved by arc consistency
+        self.supports = dict()
+        self.stats = Counter()
+
+        # Per variable and crossing position, a Counter of the letters found
+        # there across the domain; built on first use by the set engine
+        self.letter_counts = None
+        if engine == "bitset":
+            self.domains = {
+                var: BitsetDomain(self.crossword.index, var.length)
+                for var in self.crossword.variables
+            }
+        else:
+            self.domains = {
+                var: self.crossword.words.copy()
+                for var in self.crossword.variables
+            }
 
     def letter_grid(self, assignment):
         """
@@ -35,63 +107,212 @@ class CrosswordCreator():
         """
         Print crossword assignment to the terminal.
         """
+        print(self.text(assignment), end="")
+
+    def text(self, assignment):
+        """
+        Return crossword assignment as the text printed by `print`.
+        """
         letters = self.letter_grid(assignment)
+        lines = []
         for i in range(self.crossword.height):
+            line = ""
             for j in range(self.crossword.width):
                 if self.crossword.structure[i][j]:
-                    print(letters[i][j] or " ", end="")
+                    line += letters[i][j] or " "
                 else:
-                    print("█", end="")
-            print()
+                    line += "█"
+            lines.append(line + "\n")
+        return "".join(lines)
 
     def save(self, assignment, filename):
         """
-        Save crossword assignment to an image file.
+        Save crossword assignment to an image file, or to an SVG document
+        if `filename` ends in .svg.
         """
-        from PIL import Image, ImageDraw, ImageFont
-        cell_size = 100
-        cell_border = 2
-        interior_size = cell_size - 2 * cell_border
+        from render import renderer
         letters = self.letter_grid(assignment)
+        if filename.lower().endswith(".svg"):
+            renderer.svg(self.crossword, letters, filename)
+        else:
+            renderer.png(self.crossword, letters, filename)
 
-        # Create a blank canvas
-        img = Image.new(
-            "RGBA",
-            (self.crossword.width * cell_size,
-             self.crossword.height * cell_size),
-            "black"
-        )
-        font = ImageFont.truetype("assets/fonts/OpenSans-Regular.ttf", 80)
-        draw = ImageDraw.Draw(img)
+    def solve(self, inference="none", workers=1, timeout=None):
+        """
+        Enforce node and arc consistency, and then solve the CSP.
 
-        for i in range(self.crossword.height):
-            for j in range(self.crossword.width):
+        `inference` is one of `INFERENCES`: "none" only checks consistency
+        while searching, "forward-checking" prunes the domains of a newly
+        assigned variable's neighbors, and "mac" also restores arc
+        consistency from those neighbors outward.
 
-                rect = [
-                    (j * cell_size + cell_border,
-                     i * cell_size + cell_border),
-                    ((j + 1) * cell_size - cell_border,
-                     (i + 1) * cell_size - cell_border)
-                ]
-                if self.crossword.structure[i][j]:
-                    draw.rectangle(rect, fill="white")
-                    if letters[i][j]:
-                        w, h = draw.textsize(letters[i][j], font=font)
-                        draw.text(
-                            (rect[0][0] + ((interior_size - w) / 2),
-                             rect[0][1] + ((interior_size - h) / 2) - 10),
-                            letters[i][j], fill="black", font=font
-                        )
+        Groups of variables that never overlap one another are solved as
+        separate problems, across `workers` processes if it is above 1.
 
-        img.save(filename)
+        Raise TimeoutError if solving, arc consistency included, runs longer
+        than `timeout` seconds.
+        """
+        self.begin(inference, timeout)
+        try:
+            self.enforce_node_consistency()
+            self.ac3()
+            self.trail = []
+            components = self.crossword.components()
+            if len(components) > 1:
+                return self.solve_components(components, workers)
+            return self.backtrack(dict())
+        finally:
+            # Undo the search's pruning even when it times out
+            if self.trail:
+                self.restore(0)
 
-    def solve(self):
+    def begin(self, inference, timeout=None):
         """
-        Enforce node and arc consistency, and then solve the CSP.
+        Prepare this creator for a new run with `inference` that gives up
+        after `timeout` seconds, if not None: undo the pruning an earlier
+        run's search left on the trail, and forget its residual supports.
+        """
+        if inference not in CrosswordCreator.INFERENCES:
+            raise ValueError(f"unknown inference mode: {inference}")
+        self.inference = inference
+        self.deadline = None
+        if timeout is not None:
+            self.deadline = time.monotonic() + timeout
+        if self.trail:
+            self.restore(0)
+        self.trail = None
+        self.supports.clear()
+
+    def solve_components(self, components, workers=1):
+        """
+        Solve each component (a list of variables that overlap only one
+        another) on its own, optionally across `workers` processes, and
+        merge the results.
+
+        Components never share a crossing but may still pick the same word.
+        In that case they are searched again in turn, each one avoiding the
+        words already placed by the ones before it.
+
+        Worker processes get the time left before `self.deadline`, so the
+        timeout of `solve` covers them too.
+        """
+        variables = self.variables
+        components = [set(component) for component in components]
+        components = [
+            [var for var in variables if var in component]
+            for component in components
+        ]
+        self.stats["components"] += len(components)
+        try:
+            if workers > 1:
+                settings = self.settings()
+                timeout = None
+                if self.deadline is not None:
+                    timeout = max(0, self.deadline - time.monotonic())
+                with multiprocessing.Pool(workers) as pool:
+                    parts = pool.starmap(solve_component, [
+                        (self.crossword, settings, component, timeout)
+                        for component in components
+                    ])
+            else:
+                parts = []
+                for component in components:
+                    self.variables = component
+                    parts.append(self.backtrack(dict()))
+                    if parts[-1] is None:
+                        break
+                    parts[-1] = dict(parts[-1])
+                self.restore(0)
+
+            # A component with no solution of its own sinks the whole puzzle
+            if any(part is None for part in parts):
+                return None
+            assignment = dict()
+            for part in parts:
+                assignment.update(part)
+            if len(set(assignment.values())) == len(assignment):
+                return assignment
+
+            self.stats["component_conflicts"] += 1
+            assignment = dict()
+            if self.solve_chain(components, assignment, set()):
+                return assignment
+            return None
+        finally:
+            self.variables = variables
+
+    def solve_chain(self, components, assignment, used):
+        """
+        Extend `assignment` over every one of `components` in turn, moving
+        on to the next solution of a component only when the components
+        after it cannot be completed with the words in `used`.
+
+        Return True on success; return False otherwise.
+        """
+        if not components:
+            return True
+        solutions = self.search(assignment, used)
+        while True:
+            # Search reads `self.variables`, so point it back at this
+            # component every time its generator is resumed
+            self.variables = components[0]
+            if next(solutions, None) is None:
+                return False
+            if self.solve_chain(components[1:], assignment, used):
+                return True
+
+    def iter_solutions(self, limit=None, inference="none"):
+        """
+        Enforce node and arc consistency, then lazily yield complete
+        assignments, at most `limit` of them if it is not None.
+
+        The same assignment dict is yielded each time and changes once the
+        generator resumes, so copy it to keep a solution around.
         """
+        self.begin(inference)
         self.enforce_node_consistency()
-        self.ac3()
-        return self.backtrack(dict())
+        if not self.ac3():
+            return
+        self.trail = []
+        count = 0
+        try:
+            for assignment in self.search(dict(), set()):
+                yield assignment
+                count += 1
+                if limit is not None and count >= limit:
+                    return
+        finally:
+            self.restore(0)
+
+    def count_solutions(self, inference="forward-checking"):
+        """
+        Return the number of complete assignments.
+
+        Variables are split into groups that share neither an overlap nor a
+        word length, so no constraint links two groups: each group is
+        counted on its own and the counts are multiplied.
+        """
+        self.begin(inference)
+        self.enforce_node_consistency()
+        if not self.ac3():
+            return 0
+        self.trail = []
+
+        variables = self.variables
+        total = 1
+        try:
+            for group in self.crossword.components(same_length=True):
+                group = set(group)
+                self.variables = [var for var in variables if var in group]
+                count = sum(1 for _ in self.search(dict(), set()))
+                self.stats["components_counted"] += 1
+                total *= count
+                if total == 0:
+                    break
+        finally:
+            self.variables = variables
+            self.restore(0)
+        return total
 
     def enforce_node_consistency(self):
         """
@@ -104,8 +325,8 @@ class CrosswordCreator():
             for val in self.domains[var]:
                 if var.length != len(val):
                     remove.append(val)
-            for val in remove:
-                self.domains[var].remove(val)
+            if remove:
+                self.prune(var, remove)
         
     def revise(self, x, y):
         """
@@ -116,26 +337,76 @@ class CrosswordCreator():
         Return True if a revision was made to the domain of `x`; return
         False if no revision was made.
         """
+        self.stats["revisions"] += 1
+        if self.engine == "bitset":
+            return self.revise_bitset(x, y)
+
         revised = False
         removal = []
+        overlap = self.crossword.overlap(x, y)
+        ydomain = self.domains[y]
         for xval in self.domains[x]:
             satisified = False
-            for yval in self.domains[y]:
-                assignment = dict()
-                assignment[x] = xval
-                assignment[y] = yval
-                if self.consistent(assignment):
-                    satisified = True
-                    break
+            if len(xval) == x.length:
+                # A support found earlier is still valid while it is in the
+                # domain of y, since the constraint itself never changes;
+                # otherwise scan the whole domain again
+                last = self.supports.get((x, xval, y))
+                if last is not None and last in ydomain:
+                    self.stats["residues_reused"] += 1
+                    continue
+                for yval in ydomain:
+                    self.stats["support_checks"] += 1
+                    if self.compatible(xval, yval, overlap, y.length):
+                        self.supports[x, xval, y] = yval
+                        satisified = True
+                        break
             if satisified == False:
                 removal.append(xval)
                 revised = True
 
-        for val in removal:
-            self.domains[x].remove(val)
+        if removal:
+            self.prune(x, removal)
 
         return revised
 
+    def revise_bitset(self, x, y):
+        """
+        Bitset version of `revise`. A value of `x` is supported when `y`'s
+        domain, ANDed with the letter table at the overlap, is non-empty and
+        holds some word other than the value itself.
+        """
+        index = self.crossword.index
+        xdomain = self.domains[x]
+        ydomain = self.domains[y]
+        overlap = self.crossword.overlap(x, y)
+
+        # Pair each group of x values with the y values that could support it
+        if overlap is None:
+            groups = [(xdomain.mask, ydomain.mask)]
+        else:
+            ytable = index.table(y.length, overlap[1])
+            groups = [
+                (xbits & xdomain.mask, ytable.get(letter, 0) & ydomain.mask)
+                for letter, xbits in index.table(x.length, overlap[0]).items()
+            ]
+
+        supported = 0
+        for candidates, support in groups:
+            if not candidates or not support:
+                continue
+            # A single supporting word cannot support itself; leave out only
+            # this group's copy of it, as another group may support it
+            if x.length == y.length and support & (support - 1) == 0:
+                candidates &= ~support
+            supported |= candidates
+
+        if supported == xdomain.mask:
+            return False
+        removed = xdomain.mask & ~supported
+        self.prune(x, BitsetDomain(index, x.length, removed))
+        return True
+
     def ac3(self, arcs=None):
         """
         Update `self.domains` such that each variable is arc consistent.
@@ -145,44 +416,168 @@ class CrosswordCreator():
         Return True if arc consistency is enforced and no domains are empty;
         return False if one or more domains end up empty.
         """
-        queue = arcs
         if arcs == None:
-            queue = self.getAllArcs()
-        
-        while len(queue) != 0:
-            a = queue.pop()
+            arcs = self.getAllArcs()
+
+        # FIFO worklist; `queued` holds the arcs currently in it so an arc
+        # is never queued twice
+        queue = deque()
+        queued = set()
+        for arc in arcs:
+            if arc in queued:
+                self.stats["revisions_saved"] += 1
+            else:
+                queue.append(arc)
+                queued.add(arc)
+
+        while queue:
+            self.check_deadline()
+            a = queue.popleft()
+            queued.remove(a)
             if self.revise(a[0], a[1]):
                 if len(self.domains[a[0]]) == 0:
                     return False
 
-                if self.getNeighbors(a[0]) != None:
-                    for n in self.getNeighbors(a[0]):
-                        if not n.__eq__(a[1]):
+                for n, _ in self.crossword.adjacent[a[0]]:
+                    if not n.__eq__(a[1]):
+                        if (n, a[0]) in queued:
+                            self.stats["revisions_saved"] += 1
+                        else:
                             queue.append((n, a[0]))
+                            queued.add((n, a[0]))
         return True
     
-    def getNeighbors(self, x):
-        neighbors = []
+    def prune(self, var, values):
+        """
+        Remove `values` from the domain of `var`, recording them on the trail
+        during search so `restore` can put them back.
+        """
+        domain = self.domains[var]
+        if isinstance(values, BitsetDomain):
+            domain.mask &= ~values.mask
+        else:
+            for value in values:
+                domain.remove(value)
+            self.recount(var, values, -1)
+        if self.trail is not None:
+            self.trail.append((var, values))
+
+    def restore(self, mark):
+        """
+        Undo every pruning recorded on the trail since it had length `mark`.
+        """
+        while len(self.trail) > mark:
+            var, values = self.trail.pop()
+            self.domains[var].update(values)
+            if not isinstance(values, BitsetDomain):
+                self.recount(var, values, 1)
+
+    def count_letters(self):
+        """
+        Build `self.letter_counts` from the current domains, counting the
+        letters of each domain at every position where a neighbor crosses.
+        """
+        self.letter_counts = dict()
         for var in self.crossword.variables:
-            if (not var.__eq__(x)) and self.crossword.overlaps[x, var] != None:
-                neighbors.append(var)
-        
-        return neighbors
+            positions = set(i for _, (i, j) in self.crossword.adjacent[var])
+            self.letter_counts[var] = {
+                i: Counter(word[i:i + 1] for word in self.domains[var])
+                for i in positions
+            }
+
+    def recount(self, var, values, sign):
+        """
+        Add (`sign` 1) or remove (`sign` -1) `values` from the letter counts
+        of `var`, if they have been built.
+        """
+        if self.letter_counts is None:
+            return
+        for i, counts in self.letter_counts[var].items():
+            for value in values:
+                counts[value[i:i + 1]] += sign
+
+    def letter_count(self, var, position, letter):
+        """
+        Return how many words in the domain of `var` have `letter` at
+        `position`, which must be a position where a neighbor crosses `var`.
+        """
+        domain = self.domains[var]
+        if isinstance(domain, BitsetDomain):
+            return (domain.mask & self.crossword.index.matching(
+                var.length, position, letter
+            )).bit_count()
+        if self.letter_counts is None:
+            self.count_letters()
+        return self.letter_counts[var][position][letter]
+
+    def infer(self, var, value, assignment):
+        """
+        Shrink the domains of `var`'s unassigned neighbors after assigning
+        it `value`, according to `self.inference`.
+
+        Return False if some domain ends up empty; return True otherwise.
+        """
+        if self.inference == "none":
+            return True
+
+        # Forward checking: drop neighbor values that disagree with `value`,
+        # remembering which neighbor, if any, was wiped out
+        self.wiped_out = None
+        index = self.crossword.index
+        shrunk = []
+        for neighbor, overlap in self.crossword.adjacent[var]:
+            if neighbor in assignment:
+                continue
+            domain = self.domains[neighbor]
+            if self.engine == "bitset":
+                keep = domain.mask & index.table(
+                    neighbor.length, overlap[1]
+                ).get(value[overlap[0]], 0)
+                if neighbor.length == len(value):
+                    keep &= ~(1 << index.bit(value))
+                removed = domain.mask & ~keep
+                if removed:
+                    self.prune(neighbor, BitsetDomain(
+                        index, neighbor.length, removed
+                    ))
+                    shrunk.append(neighbor)
+            else:
+                removal = [
+                    word for word in domain
+                    if not self.compatible(value, word, overlap,
+                                           neighbor.length)
+                ]
+                if removal:
+                    self.prune(neighbor, removal)
+                    shrunk.append(neighbor)
+            if len(domain) == 0:
+                self.wiped_out = neighbor
+                return False
+
+        # Maintained arc consistency: fix `var` to `value` and propagate.
+        # Forward checking already made every (neighbor, var) arc
+        # consistent, so start from the arcs into each neighbor that shrank
+        if self.inference == "mac":
+            self.prune(var, [word for word in self.domains[var]
+                             if word != value])
+            return self.ac3([
+                (z, neighbor) for neighbor in shrunk
+                for z, _ in self.crossword.adjacent[neighbor] if z != var
+            ])
+        return True
+
+    def getNeighbors(self, x):
+        return [neighbor for neighbor, _ in self.crossword.adjacent[x]]
 
     def getAllArcs(self):
-        arcs = []
-        for var1 in self.crossword.variables:
-            for var2 in self.crossword.variables:
-                if var1 != var2 and self.crossword.overlaps[var1, var2] != None:
-                    arcs.append((var1, var2))
-        return arcs
+        return list(self.crossword.arcs)
 
     def assignment_complete(self, assignment):
         """
         Return True if `assignment` is complete (i.e., assigns a value to each
-        crossword variable); return False otherwise.
+        variable being searched); return False otherwise.
         """
-        for var in self.crossword.variables:
+        for var in self.variables:
             if var not in assignment.keys() and assignment.get(var) == None:
                 return False
 
@@ -193,19 +588,45 @@ class CrosswordCreator():
         Return True if `assignment` is consistent (i.e., words fit in crossword
         puzzle without conflicting characters); return False otherwise.
         """
-        for var1 in assignment.keys():
-            if var1.length != len(assignment[var1]):
+        words = list(assignment.values())
+        if len(set(words)) != len(words):
+            return False
+        for var, value in assignment.items():
+            if var.length != len(value):
                 return False
-            for var2 in assignment.keys():
-                if not var1.__eq__(var2):
-                    overlap = self.crossword.overlaps[var1, var2]
-                    if overlap != None and assignment[var1][overlap[0]] != assignment[var2][overlap[1]]:
-                        return False
-                    if assignment[var1] == assignment[var2]:
-                        return False
-        
+            for neighbor, overlap in self.crossword.adjacent[var]:
+                other = assignment.get(neighbor)
+                if other is not None and value[overlap[0]] != other[overlap[1]]:
+                    return False
+
         return True
 
+    def consistent_with(self, var, value, assignment, used):
+        """
+        Return True if adding `var` = `value` to a consistent `assignment`
+        keeps it consistent. Only `var`'s neighbors are checked, and `used`
+        is the set of words already in `assignment`.
+        """
+        if var.length != len(value) or value in used:
+            return False
+        for neighbor, overlap in self.crossword.adjacent[var]:
+            other = assignment.get(neighbor)
+            if other is not None and value[overlap[0]] != other[overlap[1]]:
+                return False
+        return True
+
+    @staticmethod
+    def compatible(xval, yval, overlap, length):
+        """
+        Return True if `yval`, a candidate for a variable of `length`
+        letters, can sit next to `xval` given their `overlap`.
+        """
+        return (
+            len(yval) == length
+            and xval != yval
+            and (overlap is None or xval[overlap[0]] == yval[overlap[1]])
+        )
+
     def order_domain_values(self, var, assignment):
         """
         Return a list of values in the domain of `var`, in order by
@@ -213,17 +634,24 @@ class CrosswordCreator():
         The first value in the list, for example, should be the one
         that rules out the fewest values among the neighbors of `var`.
         """
+        # A value rules out every word of an unassigned neighbor except those
+        # sharing its letter at the crossing, so the count is the neighbor's
+        # domain size less one letter count
+        crossings = [
+            (neighbor, overlap[0], overlap[1], len(self.domains[neighbor]))
+            for neighbor, overlap in self.crossword.adjacent[var]
+            if neighbor not in assignment
+        ]
+
         def leastContrainValHeuristic(val):
             count = 0
-            for neighbor in self.getNeighbors(var):
-                if neighbor not in assignment:
-                    for val2 in self.domains[neighbor]:
-                        overlap = self.crossword.overlaps[var, neighbor]
-                        if val[overlap[0]] != val2[overlap[1]]:
-                            count += 1
+            for neighbor, i, j, size in crossings:
+                count += size - self.letter_count(neighbor, j, val[i])
             return count
 
         values = list(self.domains[var])
+        if self.random is not None:
+            self.random.shuffle(values)
         values.sort(key=leastContrainValHeuristic)
         return values
 
@@ -236,60 +664,361 @@ class CrosswordCreator():
         return values.
         """
         
+        adjacent = self.crossword.adjacent
         minimum = None
-        for var in self.crossword.variables:
-            if var not in assignment.keys():
-                if minimum not in self.crossword.variables:
+        for var in self.variables:
+            if var not in assignment:
+                if minimum is None:
                     minimum = var
                 if len(self.domains[var]) < len(self.domains[minimum]):
                     minimum = var
                 elif len(self.domains[var]) == len(self.domains[minimum]):
-                    if self.getNeighbors(var) != None and self.getNeighbors(minimum) != None:
-                        if len(self.getNeighbors(var)) > len(self.getNeighbors(minimum)):
-                            minimum = var
-                    elif self.getNeighbors(var) != None and self.getNeighbors(minimum) == None:
+                    if len(adjacent[var]) > len(adjacent[minimum]):
                         minimum = var
         return minimum
 
-    def backtrack(self, assignment):
+    def backtrack(self, assignment, used=None):
         """
         Using Backtracking Search, take as input a partial assignment for the
         crossword and return a complete assignment if possible to do so.
 
-        `assignment` is a mapping from variables (keys) to words (values).
+        `assignment` is a mapping from variables (keys) to words (values),
+        and `used` is the set of words it already contains.
 
         If no assignment is possible, return None.
         """
+        if used is None:
+            used = set(assignment.values())
+            if self.trail is None:
+                self.trail = []
+        if self.backjumping:
+            return self.backjump(assignment, used)[0]
+        return next(self.search(assignment, used), None)
+
+    def check_deadline(self):
+        """
+        Raise TimeoutError if `self.deadline` has passed.
+        """
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise TimeoutError("crossword search timed out")
+
+    def backjump(self, assignment, used):
+        """
+        Conflict-directed backjumping version of `backtrack`.
+
+        Return a pair of the complete assignment (or None) and, on failure,
+        the conflict set: assigned variables whose current values alone
+        leave no way to complete `assignment`. A variable not in the
+        conflict set of the search below it is jumped over.
+        """
+        self.check_deadline()
+        if self.assignment_complete(assignment):
+            return assignment, set()
+        var = self.select_unassigned_variable(assignment)
+
+        # Values already pruned from the domain of `var` count against the
+        # variables whose assignments pruned them
+        conflicts = self.culprits(var, assignment)
+        for value in self.order_domain_values(var, assignment):
+            blame = self.conflicts_with(var, value, assignment, used)
+            if blame is not None:
+                conflicts |= blame
+                continue
+
+            self.stats["nodes"] += 1
+            assignment[var] = value
+            used.add(value)
+            mark = len(self.trail)
+            if self.infer(var, value, assignment):
+                result, blame = self.backjump(assignment, used)
+                if result is not None:
+                    return result, set()
+                if var not in blame:
+                    self.stats["backjumps"] += 1
+                    self.restore(mark)
+                    del assignment[var]
+                    used.remove(value)
+                    return None, blame
+            else:
+                blame = self.culprits(self.wiped_out, assignment)
+            conflicts |= blame - {var}
+            self.restore(mark)
+            del assignment[var]
+            used.remove(value)
+
+        self.learn(conflicts, assignment)
+        return None, conflicts
+
+    def conflicts_with(self, var, value, assignment, used):
+        """
+        Return None if `var` = `value` is consistent with `assignment` and
+        no nogood forbids it. Otherwise return the set of assigned variables
+        that rule it out: neighbors with a clashing letter, the variable
+        already holding `value`, or the other members of a matching nogood.
+        """
+        if var.length != len(value):
+            return set()
+        blame = set()
+        for neighbor, overlap in self.crossword.adjacent[var]:
+            other = assignment.get(neighbor)
+            if other is not None and value[overlap[0]] != other[overlap[1]]:
+                blame.add(neighbor)
+        if value in used:
+            blame.update(
+                other for other, word in assignment.items() if word == value
+            )
+        if blame:
+            return blame
+
+        if self.nogood_index:
+            for nogood in self.nogood_index.get((var, value), ()):
+                if all(assignment.get(other) == word
+                       for other, word in nogood if other != var):
+                    self.nogoods.move_to_end(nogood)
+                    self.stats["nogood_hits"] += 1
+                    return set(other for other, _ in nogood) - {var}
+        return None
+
+    def culprits(self, var, assignment):
+        """
+        Return the assigned variables that inference may have used to prune
+        the domain of `var`.
+        """
+        if self.inference == "none":
+            return set()
+        if self.inference == "forward-checking" and var is not None:
+            return set(
+                neighbor for neighbor, _ in self.crossword.adjacent[var]
+                if neighbor in assignment
+            )
+        # Arc consistency propagates through the whole grid
+        return set(assignment)
+
+    def learn(self, conflicts, assignment):
+        """
+        Record the values `assignment` gives to `conflicts` as a nogood,
+        evicting the least recently used nogood past `self.nogood_limit`.
+        """
+        if not self.nogood_limit or not conflicts:
+            return
+        nogood = frozenset((var, assignment[var]) for var in conflicts)
+        if nogood in self.nogoods:
+            self.nogoods.move_to_end(nogood)
+            return
+        self.nogoods[nogood] = None
+        for pair in nogood:
+            self.nogood_index.setdefault(pair, set()).add(nogood)
+        self.stats["nogoods_learned"] += 1
+        if len(self.nogoods) > self.nogood_limit:
+            old, _ = self.nogoods.popitem(last=False)
+            for pair in old:
+                self.nogood_index[pair].discard(old)
+                if not self.nogood_index[pair]:
+                    del self.nogood_index[pair]
+
+    def search(self, assignment, used):
+        """
+        Generator behind `backtrack`: yield `assignment` each time it has
+        been extended to a complete assignment, undoing the extension (and
+        any inference) as the search moves on.
+        """
+        self.check_deadline()
         if self.assignment_complete(assignment):
-            return assignment
+            yield assignment
+            return
         var = self.select_unassigned_variable(assignment)
         for value in self.order_domain_values(var, assignment):
-            checkAssign = assignment.copy()
-            checkAssign[var] = value
-            if self.consistent(checkAssign):
+            if self.consistent_with(var, value, assignment, used):
+                self.stats["nodes"] += 1
                 assignment[var] = value
-                result = self.backtrack(assignment)
-                if result != False:
-                    return result
+                used.add(value)
+                mark = len(self.trail)
+                if self.infer(var, value, assignment):
+                    yield from self.search(assignment, used)
+                self.restore(mark)
                 del assignment[var]
-        return False
+                used.remove(value)
 
+    def solve_parallel(self, workers=None, timeout=None,
+                       inference="none"):
+        """
+        Solve the CSP with a portfolio of `workers` backtracking searches
+        (default: one per CPU) run in a process pool, and return the first
+        complete assignment any of them finds.
 
-def main():
+        The first search uses this creator's seed and `inference`; the others
+        use seeds 1, 2, ... and cycle through the inference modes. Once a
+        search succeeds the remaining ones are cancelled, and its counters
+        are added to `self.stats`.
+
+        Return None if every search fails; raise TimeoutError if no search
+        finishes within `timeout` seconds.
+        """
+        workers = workers or os.cpu_count() or 1
+        if inference not in CrosswordCreator.INFERENCES:
+            raise ValueError(f"unknown inference mode: {inference}")
+        modes = [inference] + [
+            mode for mode in reversed(CrosswordCreator.INFERENCES)
+            if mode != inference
+        ]
+        portfolio = [self.settings(inference=inference)] + [
+            self.settings(seed=k, inference=modes[k % len(modes)])
+            for k in range(1, workers)
+        ]
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        results = queue.Queue()
+        with multiprocessing.Pool(workers) as pool:
+            for settings in portfolio:
+                pool.apply_async(
+                    solve_portfolio, (self.crossword, settings),
+                    callback=results.put, error_callback=results.put
+                )
+            for _ in portfolio:
+                remaining = None
+                if deadline is not None:
+                    remaining = max(0, deadline - time.monotonic())
+                try:
+                    result = results.get(timeout=remaining)
+                except queue.Empty:
+                    raise TimeoutError(f"no solution within {timeout} s")
+                if isinstance(result, BaseException):
+                    raise result
+                assignment, stats = result
+                if assignment is not None:
+                    self.stats.update(stats)
+                    return assignment
 
-    # Check usage
-    if len(sys.argv) not in [3, 4]:
-        sys.exit("Usage: python generate.py structure words [output]")
+        # Leaving the pool terminates any search still running
+        return None
+
+    def settings(self, **overrides):
+        """
+        Return the options needed to rebuild this creator in a worker
+        process, including its inference mode, with `overrides` applied.
+        """
+        settings = dict(
+            engine=self.engine,
+            seed=self.seed,
+            backjumping=self.backjumping,
+            nogood_limit=self.nogood_limit,
+            inference=self.inference
+        )
+        settings.update(overrides)
+        return settings
+
+    def to_json(self, assignment):
+        """
+        Return `assignment` as a JSON-serializable list of words, one
+        object per variable in grid order.
+        """
+        return [
+            {
+                "i": var.i,
+                "j": var.j,
+                "direction": var.direction,
+                "length": var.length,
+                "word": assignment[var]
+            }
+            for var in self.crossword.order
+            if var in assignment
+        ]
+
+
+def solve_component(crossword, settings, component, timeout=None):
+    """
+    Solve the variables in `component` of `crossword` on their own with the
+    given `settings` (see `CrosswordCreator.settings`), raising TimeoutError
+    after `timeout` seconds; used as a process pool task by
+    `solve_components`.
+    """
+    settings = dict(settings)
+    inference = settings.pop("inference")
+    creator = CrosswordCreator(crossword, **settings)
+    creator.variables = component
+    creator.inference = inference
+    if timeout is not None:
+        creator.deadline = time.monotonic() + timeout
+    creator.enforce_node_consistency()
+    creator.ac3([arc for arc in crossword.arcs if arc[0] in component])
+    creator.trail = []
+    return creator.backtrack(dict())
+
+
+def solve_portfolio(crossword, settings):
+    """
+    Solve `crossword` with one set of portfolio `settings` (see
+    `CrosswordCreator.settings`) and return the assignment, or None, with
+    the search's counters; used as a process pool task by `solve_parallel`.
+    """
+    settings = dict(settings)
+    inference = settings.pop("inference")
+    creator = CrosswordCreator(crossword, **settings)
+    return creator.solve(inference=inference), creator.stats
+
+
+def main():
 
     # Parse command-line arguments
-    structure = sys.argv[1]
-    words = sys.argv[2]
-    output = sys.argv[3] if len(sys.argv) == 4 else None
+    parser = argparse.ArgumentParser(
+        usage="python generate.py structure words [output]"
+    )
+    parser.add_argument("structure")
+    parser.add_argument("words")
+    parser.add_argument("output", nargs="?")
+    parser.add_argument("--engine", choices=CrosswordCreator.ENGINES,
+                        default="set", help="how domains are stored")
+    parser.add_argument("--inference", choices=CrosswordCreator.INFERENCES,
+                        default="none",
+                        help="domain pruning after each assignment")
+    parser.add_argument("--backjumping", action="store_true",
+                        help="use conflict-directed backjumping")
+    parser.add_argument("--nogoods", type=int, default=0, metavar="N",
+                        help="with --backjumping, remember up to N nogoods")
+    parser.add_argument("--stats", action="store_true",
+                        help="print search and arc consistency counters")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of portfolio searches run in parallel")
+    parser.add_argument("--timeout", type=float,
+                        help="give up after this many seconds")
+    parser.add_argument("--all", action="store_true",
+                        help="stream every solution as it is found")
+    parser.add_argument("--limit", type=int,
+                        help="stream at most this many solutions")
+    parser.add_argument("--jsonl", metavar="FILE",
+                        help="stream solutions as JSON lines to FILE "
+                             "(- for stdout) instead of printing grids")
+    parser.add_argument("--count", action="store_true",
+                        help="print the number of solutions")
+    args = parser.parse_args()
+    structure = args.structure
+    words = args.words
+    output = args.output
 
     # Generate crossword
     crossword = Crossword(structure, words)
-    creator = CrosswordCreator(crossword)
-    assignment = creator.solve()
+    creator = CrosswordCreator(
+        crossword, engine=args.engine,
+        backjumping=args.backjumping, nogood_limit=args.nogoods
+    )
+    if args.count:
+        print(creator.count_solutions(inference=args.inference))
+        return
+    if args.all or args.limit is not None or args.jsonl:
+        stream_solutions(creator, args)
+        return
+    try:
+        if args.workers > 1:
+            assignment = creator.solve_parallel(
+                workers=args.workers, timeout=args.timeout,
+                inference=args.inference
+            )
+        else:
+            assignment = creator.solve(
+                inference=args.inference, timeout=args.timeout
+            )
+    except TimeoutError:
+        sys.exit("Timed out.")
 
     # Print result
     if assignment is None:
@@ -298,6 +1027,43 @@ def main():
         creator.print(assignment)
         if output:
             creator.save(assignment, output)
+    if args.stats:
+        for name, count in sorted(creator.stats.items()):
+            print(f"{name}: {count}")
+
+
+def stream_solutions(creator, args):
+    """
+    Print or write solutions as they are found, following the command-line
+    `args` of `main`.
+    """
+    if args.jsonl == "-":
+        out = sys.stdout
+    elif args.jsonl:
+        out = open(args.jsonl, "w")
+    else:
+        out = None
+
+    found = 0
+    try:
+        for assignment in creator.iter_solutions(
+            limit=args.limit, inference=args.inference
+        ):
+            found += 1
+            if out is None:
+                if found > 1:
+                    print()
+                creator.print(assignment)
+            else:
+                record = {"solution": found,
+                          "words": creator.to_json(assignment)}
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+    finally:
+        if out is not None and out is not sys.stdout:
+            out.close()
+    if found == 0:
+        print("No solution.", file=sys.stderr if out is sys.stdout else None)
 
 
 if __name__ == "__main__":
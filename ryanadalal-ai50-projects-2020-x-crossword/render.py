@@ -0,0 +1,122 @@
+import os
+
+from xml.sax.saxutils import escape
+
+FONT = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    "assets", "fonts", "OpenSans-Regular.ttf"
+)
+
+
+class Renderer():
+
+    def __init__(self, cell_size=100, cell_border=2, font_file=FONT,
+                 font_size=80):
+        """
+        Create a renderer for crossword grids. The font is loaded on first
+        use and each cell image is drawn once and then reused.
+        """
+        self.cell_size = cell_size
+        self.cell_border = cell_border
+        self.interior_size = cell_size - 2 * cell_border
+        self.font_file = font_file
+        self.font_size = font_size
+        self.font = None
+        self.sprites = dict()
+
+    def sprite(self, letter):
+        """
+        Return the image of a white cell holding `letter` (or nothing, if
+        `letter` is empty), drawing it the first time it is asked for.
+        """
+        if letter in self.sprites:
+            return self.sprites[letter]
+
+        from PIL import Image, ImageDraw, ImageFont
+        if self.font is None:
+            self.font = ImageFont.truetype(self.font_file, self.font_size)
+
+        # Cell rectangles are drawn with both corners included
+        size = self.interior_size + 1
+        sprite = Image.new("RGBA", (size, size), "white")
+        if letter:
+            draw = ImageDraw.Draw(sprite)
+            w, h = text_size(draw, letter, self.font)
+            draw.text(
+                ((self.interior_size - w) / 2,
+                 (self.interior_size - h) / 2 - 10),
+                letter, fill="black", font=self.font
+            )
+        self.sprites[letter] = sprite
+        return sprite
+
+    def png(self, crossword, letters, filename):
+        """
+        Save the grid of `letters` for `crossword` as a raster image.
+        """
+        from PIL import Image
+        img = Image.new(
+            "RGBA",
+            (crossword.width * self.cell_size,
+             crossword.height * self.cell_size),
+            "black"
+        )
+        for i in range(crossword.height):
+            for j in range(crossword.width):
+                if crossword.structure[i][j]:
+                    img.paste(
+                        self.sprite(letters[i][j] or ""),
+                        (j * self.cell_size + self.cell_border,
+                         i * self.cell_size + self.cell_border)
+                    )
+        img.save(filename)
+
+    def svg(self, crossword, letters, filename):
+        """
+        Save the grid of `letters` for `crossword` as an SVG document, which
+        needs no font loading or rasterization.
+        """
+        width = crossword.width * self.cell_size
+        height = crossword.height * self.cell_size
+        size = self.interior_size + 1
+        baseline = round(self.font_size * 81 / 80)
+        lines = [
+            f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" '
+            f'height="{height}" viewBox="0 0 {width} {height}">',
+            f'<rect width="{width}" height="{height}" fill="black"/>',
+            f'<g font-family="Open Sans, sans-serif" '
+            f'font-size="{self.font_size}" text-anchor="middle">'
+        ]
+        for i in range(crossword.height):
+            for j in range(crossword.width):
+                if not crossword.structure[i][j]:
+                    continue
+                x = j * self.cell_size + self.cell_border
+                y = i * self.cell_size + self.cell_border
+                lines.append(
+                    f'<rect x="{x}" y="{y}" width="{size}" '
+                    f'height="{size}" fill="white"/>'
+                )
+                if letters[i][j]:
+                    lines.append(
+                        f'<text x="{x + self.interior_size / 2}" '
+                        f'y="{y + baseline}">{escape(letters[i][j])}</text>'
+                    )
+        lines.append("</g>")
+        lines.append("</svg>")
+        with open(filename, "w") as f:
+            f.write("\n".join(lines) + "\n")
+
+
+def text_size(draw, text, font):
+    """
+    Return the (width, height) that `ImageDraw.textsize` gave for `text`,
+    which newer versions of Pillow no longer provide.
+    """
+    if hasattr(draw, "textbbox"):
+        return draw.textbbox((0, 0), text, font=font)[2:]
+    return draw.textsize(text, font=font)
+
+
+# Shared by every save, so the font and sprites are loaded once per process
+renderer = Renderer()
@@ -0,0 +1,124 @@
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+import degrees
+
+
+def summarize(source):
+    """
+    Runs one breadth first search from `source` and returns a dict of how
+    far everyone is from them.
+    """
+    start = time.perf_counter()
+    counts = degrees.distribution(source)
+    unreachable = counts.pop(None)
+    counts.pop(0, None)
+    connected = sum(counts.values())
+    return {
+        "source": source,
+        "name": degrees.people[source]["name"],
+        "connected": connected,
+        "not_connected": unreachable,
+        "average": round(
+            sum(d * n for d, n in counts.items()) / connected, 4
+        ) if connected else None,
+        "eccentricity": max(counts) if counts else 0,
+        "histogram": {str(d): counts[d] for d in sorted(counts)},
+        "seconds": round(time.perf_counter() - start, 6)
+    }
+
+
+def read_sources(filename):
+    """
+    Returns the person_ids listed in `filename`, one IMDb id or name per
+    line, skipping (with a warning) names that match nobody or several
+    people.
+    """
+    sources = []
+    with open(filename, encoding="utf-8") as f:
+        for line in f:
+            person = line.strip()
+            if not person or person.startswith("#"):
+                continue
+            if person in degrees.people:
+                sources.append(person)
+                continue
+            person_ids = degrees.names.get(person.lower(), set())
+            if len(person_ids) == 1:
+                sources.append(next(iter(person_ids)))
+            else:
+                print(f"Skipping {person}: matches {len(person_ids)} people",
+                      file=sys.stderr)
+    return sources
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compute separation statistics from many people at "
+                    "once, spreading the searches over worker processes."
+    )
+    parser.add_argument("directory", nargs="?", default="large")
+    degrees.add_backend_argument(parser)
+    sources = parser.add_mutually_exclusive_group(required=True)
+    sources.add_argument("--sources", metavar="FILE",
+                         help="people to search from, one id or name a line")
+    sources.add_argument("--sample", type=int, metavar="N",
+                         help="search from N people chosen at random")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="random seed for --sample")
+    parser.add_argument("--output", metavar="FILE", default="-",
+                        help="file to write one JSON result per line to "
+                             "(default: stdout)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    args.backend = degrees.default_backend(args.directory, args.backend)
+
+    # Load once in the parent; forked workers share these pages copy-on-
+    # write, and the snapshot backend shares the mapped file in any case
+    print("Loading data...", file=sys.stderr)
+    degrees.load_data(args.directory, args.backend)
+    print("Data loaded.", file=sys.stderr)
+
+    if args.sources:
+        people = read_sources(args.sources)
+    else:
+        people = random.Random(args.seed).sample(
+            sorted(degrees.people), min(args.sample, len(degrees.people))
+        )
+
+    output = sys.stdout if args.output == "-" else \
+        open(args.output, "w", encoding="utf-8")
+    start = time.perf_counter()
+    count = 0
+    try:
+        with multiprocessing.Pool(
+            args.workers, initializer=degrees.load_worker,
+            initargs=(args.directory, args.backend)
+        ) as pool:
+            chunksize = max(1, len(people) // (args.workers * 16))
+            for result in pool.imap_unordered(summarize, people, chunksize):
+                output.write(json.dumps(result) + "\n")
+                output.flush()
+                count += 1
+                if count % 100 == 0:
+                    seconds = time.perf_counter() - start
+                    print(f"{count}/{len(people)} searches, "
+                          f"{count / seconds:.1f} queries/s",
+                          file=sys.stderr)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    seconds = time.perf_counter() - start
+    print(f"{count} searches in {seconds:.3f} s with {args.workers} "
+          f"workers ({count / seconds:.1f} queries/s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
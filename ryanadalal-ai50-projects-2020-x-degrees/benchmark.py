@@ -0,0 +1,157 @@
+import argparse
+import itertools
+import multiprocessing
+import time
+import tracemalloc
+
+from collections import deque
+
+import degrees
+
+BACKENDS = degrees.BACKENDS
+
+# Ways of answering a query: the previous search, which expands each person
+# through a fresh set of (movie_id, person_id) pairs, and the searches of
+# degrees.py, which expand each movie once
+SEARCHES = ("neighbors", "shortest", "bidirectional")
+
+
+def measure_memory(directory, backend, results):
+    """
+    Load `directory` with `backend` and put the load time and the memory
+    held by the loaded data on the `results` queue.
+    """
+    start = time.perf_counter()
+    degrees.load_data(directory, backend)
+    seconds = time.perf_counter() - start
+
+    # Reload under tracing, so that tracing does not slow the timed load
+    degrees.names, degrees.people, degrees.movies = {}, {}, {}
+    degrees.graph = None
+    tracemalloc.start()
+    degrees.load_data(directory, backend)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    results.put({
+        "backend": backend,
+        "seconds": round(seconds, 3),
+        "memory_mib": round(current / 2 ** 20, 1),
+        "peak_mib": round(peak / 2 ** 20, 1)
+    })
+
+
+def neighbor_set_path(source, target):
+    """
+    Returns a shortest path the way shortest_path used to find it, calling
+    neighbors_for_person for every person expanded.
+    """
+    if source == target:
+        return []
+    parents = {source: None}
+    frontier = deque([source])
+    while frontier:
+        person_id = frontier.popleft()
+        for movie_id, neighbor in degrees.neighbors_for_person(person_id):
+            if neighbor in parents:
+                continue
+            parents[neighbor] = (movie_id, person_id)
+            if neighbor == target:
+                return degrees.trace_path(parents, target)
+            frontier.append(neighbor)
+    return None
+
+
+def measure_queries(directory, backend, search, queries, results):
+    """
+    Answer the (source, target) `queries` with `search` and put the time
+    taken and the memory allocated on the `results` queue.
+    """
+    degrees.load_data(directory, backend)
+    function = {
+        "neighbors": neighbor_set_path,
+        "shortest": degrees.shortest_path,
+        "bidirectional": degrees.bidirectional_path
+    }[search]
+
+    start = time.perf_counter()
+    lengths = [function(source, target) for source, target in queries]
+    seconds = time.perf_counter() - start
+
+    # Trace a second pass, so that tracing does not slow the timed one
+    tracemalloc.start()
+    for source, target in queries:
+        function(source, target)
+        peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    results.put({
+        "backend": backend,
+        "search": search,
+        "seconds": round(seconds, 3),
+        "per_query_ms": round(1000 * seconds / len(queries), 2),
+        "peak_kib": peak // 1024,
+        "lengths": [None if path is None else len(path) for path in lengths]
+    })
+
+
+def hub_queries(directory, backend, count, results):
+    """
+    Put `count` queries between pairs of the best connected people on the
+    `results` queue.
+    """
+    degrees.load_data(directory, backend)
+    people = degrees.hubs(count + 1)
+    results.put(list(itertools.islice(
+        itertools.combinations(people, 2), count
+    )))
+
+
+def run(target, *args):
+    """
+    Run `target(*args, results)` in a fresh process, so that every
+    measurement starts from an empty heap, and return what it reports.
+    """
+    results = multiprocessing.Queue()
+    process = multiprocessing.Process(target=target, args=(*args, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare the degrees.py data representations."
+    )
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS,
+                        default=list(BACKENDS))
+    parser.add_argument("--queries", type=int, metavar="N",
+                        help="instead of memory, time N queries between the "
+                             "best connected people with each search")
+    parser.add_argument("--searches", nargs="+", choices=SEARCHES,
+                        default=list(SEARCHES))
+    args = parser.parse_args()
+
+    if args.queries:
+        queries = run(hub_queries, args.directory, "dict", args.queries)
+        for backend, search in itertools.product(args.backends, args.searches):
+            result = run(
+                measure_queries, args.directory, backend, search, queries
+            )
+            print(f"{backend} {search}: {result['seconds']} s, "
+                  f"{result['per_query_ms']} ms per query, "
+                  f"{result['peak_kib']} KiB peak, "
+                  f"degrees {result['lengths']}", flush=True)
+        return
+
+    for backend in args.backends:
+        result = run(measure_memory, args.directory, backend)
+        print(f"{backend}: loaded in {result['seconds']} s, "
+              f"{result['memory_mib']} MiB held, "
+              f"{result['peak_mib']} MiB peak", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,15 @@
-import csv
+import argparse
+import heapq
+import math
+import os
 import sys
 
-from util import Node, StackFrontier, QueueFrontier
+from collections import Counter, deque
+
+from graph import SNAPSHOT, Graph, compile_snapshot, csv_sources, open_snapshot
+from ingest import load_rows
+from landmarks import LANDMARKS, Landmarks
+from nameindex import NameIndex
 
 # Maps names to a set of corresponding person_ids
 names = {}
@@ -12,56 +20,291 @@ people = {}
 # Maps movie_ids to a dictionary of: title, year, stars (a set of person_ids)
 movies = {}
 
+# Compact graph holding the data, when loaded with the "csr" or "snapshot"
+# backend; names, people and movies are then read-only views of it
+graph = None
+
+# Prefix and fuzzy lookups of names
+name_index = None
+
+BACKENDS = ("dict", "csr", "snapshot")
+
 
-def load_data(directory):
+def load_data(directory, backend="dict", **options):
     """
-    Load data from CSV files into memory.
+    Load data from CSV files into memory, either into the names, people and
+    movies dicts or, with the "csr" backend, into a compact Graph. The
+    "snapshot" backend maps the Graph from the directory's snapshot file,
+    compiling it from the CSV files when they have changed.
+
+    Other `options` are passed to ingest.load_rows: `parallel` to read the
+    files in parallel, `progress` to report rows per second, and `seeds`
+    and `hops` to load only the people within `hops` degrees of `seeds`.
     """
+    global names, people, movies, graph, name_index
+    if backend in ("csr", "snapshot"):
+        if backend == "csr":
+            graph = Graph.from_csv(directory, **options)
+        elif options.get("seeds"):
+            raise ValueError("partial loads read the CSV files, not a "
+                             "snapshot")
+        else:
+            graph = open_snapshot(directory)
+        names, people, movies = graph.names, graph.people, graph.movies
+        name_index = graph.name_index
+        return
+
+    # Views of a previously loaded graph cannot be filled in
+    if graph is not None:
+        names, people, movies, graph = {}, {}, {}, None
+
+    person_rows, movie_rows, star_rows = load_rows(directory, **options)
+
     # Load people
-    with open(f"{directory}/people.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            people[row["id"]] = {
-                "name": row["name"],
-                "birth": row["birth"],
-                "movies": set()
-            }
-            if row["name"].lower() not in names:
-                names[row["name"].lower()] = {row["id"]}
-            else:
-                names[row["name"].lower()].add(row["id"])
+    for person_id, name, birth in person_rows:
+        people[person_id] = {
+            "name": name,
+            "birth": birth,
+            "movies": set()
+        }
+        if name.lower() not in names:
+            names[name.lower()] = {person_id}
+        else:
+            names[name.lower()].add(person_id)
 
     # Load movies
-    with open(f"{directory}/movies.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            movies[row["id"]] = {
-                "title": row["title"],
-                "year": row["year"],
-                "stars": set()
-            }
-
-    # Load stars
-    with open(f"{directory}/stars.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            try:
-                people[row["person_id"]]["movies"].add(row["movie_id"])
-                movies[row["movie_id"]]["stars"].add(row["person_id"])
-            except KeyError:
-                pass
+    for movie_id, title, year in movie_rows:
+        movies[movie_id] = {
+            "title": title,
+            "year": year,
+            "stars": set()
+        }
+
+    # Load stars, skipping any naming an unknown person or movie
+    for person_id, movie_id in star_rows:
+        if person_id in people and movie_id in movies:
+            people[person_id]["movies"].add(movie_id)
+            movies[movie_id]["stars"].add(person_id)
+
+    name_index = NameIndex.from_names(names)
+
+
+def separations(source):
+    """
+    Returns a dict mapping every person connected to `source` to their
+    degrees of separation from `source`, found in one breadth first search.
+    """
+    if graph is not None:
+        distances = graph_separations(source)
+        return {
+            graph.person_ids[n]: degrees
+            for n, degrees in enumerate(distances) if degrees != -1
+        }
+
+    separation = {source: 0}
+    expanded = set()
+    frontier = deque([source])
+    while frontier:
+        person_id = frontier.popleft()
+        degrees = separation[person_id] + 1
+        for movie_id in people[person_id]["movies"]:
+            if movie_id in expanded:
+                continue
+            expanded.add(movie_id)
+            for neighbor in movies[movie_id]["stars"]:
+                if neighbor not in separation:
+                    separation[neighbor] = degrees
+                    frontier.append(neighbor)
+    return separation
+
+
+def graph_separations(source):
+    """
+    Returns the degrees of separation of every person from `source`,
+    indexed by person number, with -1 for people who are not connected;
+    for the graph backends only.
+    """
+    return graph.distances(graph.person(source))
+
+
+def distribution(source):
+    """
+    Returns a Counter of how many people are each number of degrees of
+    separation from `source`, counting people not connected under None.
+    """
+    if graph is not None:
+        counts = Counter(graph.distances(graph.person(source)))
+        counts[None] = counts.pop(-1, 0)
+        return counts
+
+    counts = Counter(separations(source).values())
+    counts[None] = len(people) - sum(counts.values())
+    return counts
+
+
+def hubs(k):
+    """
+    Returns the person_ids of the `k` people with the most costars (counted
+    once per movie), best connected first.
+    """
+    if graph is not None:
+        def costars(person_id):
+            return sum(
+                len(graph.stars_of(movie)) - 1
+                for movie in graph.movies_of(graph.person(person_id))
+            )
+    else:
+        def costars(person_id):
+            return sum(
+                len(movies[movie_id]["stars"]) - 1
+                for movie_id in people[person_id]["movies"]
+            )
+    return heapq.nlargest(k, people, key=costars)
+
+
+def person_numbering():
+    """
+    Returns every person_id in sorted order, the numbering that landmark
+    tables use.
+    """
+    return graph.person_ids if graph is not None else sorted(people)
+
+
+def build_landmarks(directory, k):
+    """
+    Runs a breadth first search from each of the `k` best connected people
+    and saves the resulting distance oracle to the landmark table of
+    `directory`. Returns the Landmarks.
+    """
+    try:
+        sources = csv_sources(directory)
+    except FileNotFoundError:
+        sources = None
+    if graph is not None:
+        # The graph numbers people as the table does, so its distances go
+        # straight into the table
+        landmarks = Landmarks.build(
+            graph.person_ids, hubs(k), graph_separations, sources,
+            numbered=True
+        )
+    else:
+        landmarks = Landmarks.build(
+            person_numbering(), hubs(k), separations, sources
+        )
+    landmarks.save(os.path.join(directory, LANDMARKS))
+    return landmarks
+
+
+def load_landmarks(directory):
+    """
+    Returns the Landmarks saved for `directory`, or None if there are none
+    or the CSV files have changed since they were built.
+    """
+    filename = os.path.join(directory, LANDMARKS)
+    if not os.path.exists(filename):
+        return None
+    try:
+        landmarks = Landmarks.open(filename, person_numbering())
+        if landmarks.sources is not None and \
+                landmarks.sources != csv_sources(directory):
+            return None
+    except (OSError, ValueError):
+        return None
+    return landmarks
+
+
+def default_backend(directory, backend=None):
+    """
+    Returns `backend` if it is given, else "snapshot" if a snapshot was
+    compiled for `directory`, and "dict" otherwise.
+    """
+    if backend is not None:
+        return backend
+    snapshot = os.path.join(directory, SNAPSHOT)
+    return "snapshot" if os.path.exists(snapshot) else "dict"
+
+
+def add_backend_argument(parser):
+    """
+    Adds the --backend option, resolved by `default_backend`, to the
+    argparse `parser` of degrees.py or a tool built on it.
+    """
+    parser.add_argument("--backend", choices=BACKENDS,
+                        help="in-memory representation of the data "
+                             "(default: snapshot if one was compiled, "
+                             "else dict)")
+
+
+def load_worker(directory, backend):
+    """
+    Worker process initializer for tools that search in a pool: load the
+    data, unless the worker was forked from a process that already had it.
+    """
+    if not people:
+        load_data(directory, backend)
 
 
 def main():
-    if len(sys.argv) > 2:
-        sys.exit("Usage: python degrees.py [directory]")
-    directory = sys.argv[1] if len(sys.argv) == 2 else "large"
+    parser = argparse.ArgumentParser(
+        description="Find the degrees of separation between two actors."
+    )
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("--bidirectional", action="store_true",
+                        help="search from both people at once")
+    add_backend_argument(parser)
+    parser.add_argument("--compile", action="store_true",
+                        help="write a snapshot of the data for fast loading "
+                             "and exit")
+    parser.add_argument("--landmarks", type=int, metavar="K",
+                        help="save a distance oracle built from the K best "
+                             "connected people and exit")
+    parser.add_argument("--distribution", action="store_true",
+                        help="show how far everyone is from one person")
+    parser.add_argument("--parallel", action="store_true",
+                        help="read the CSV files in parallel processes")
+    parser.add_argument("--progress", action="store_true",
+                        help="report rows read per second while loading")
+    parser.add_argument("--seeds", nargs="+", metavar="PERSON",
+                        help="load only the people near these ids or names")
+    parser.add_argument("--hops", type=int, default=2,
+                        help="degrees of separation from --seeds to load")
+    args = parser.parse_args()
+
+    if args.compile:
+        print("Compiling snapshot...")
+        compile_snapshot(args.directory)
+        print(f"Snapshot written to "
+              f"{os.path.join(args.directory, SNAPSHOT)}.")
+        return
+
+    backend = args.backend or \
+        ("dict" if args.seeds else default_backend(args.directory))
 
     # Load data from files into memory
     print("Loading data...")
-    load_data(directory)
+    try:
+        load_data(
+            args.directory, backend, parallel=args.parallel,
+            progress=args.progress, seeds=args.seeds, hops=args.hops
+        )
+    except (LookupError, ValueError) as e:
+        sys.exit(str(e))
     print("Data loaded.")
 
+    if args.landmarks is not None:
+        print(f"Searching from {args.landmarks} landmarks...")
+        build_landmarks(args.directory, args.landmarks)
+        print(f"Landmarks written to "
+              f"{os.path.join(args.directory, LANDMARKS)}.")
+        return
+
+    if args.distribution:
+        source = person_id_for_name(input("Name: "))
+        if source is None:
+            sys.exit("Person not found.")
+        print_distribution(distribution(source))
+        return
+
     source = person_id_for_name(input("Name: "))
     if source is None:
         sys.exit("Person not found.")
@@ -69,7 +312,17 @@ def main():
     if target is None:
         sys.exit("Person not found.")
 
-    path = shortest_path(source, target)
+    landmarks = load_landmarks(args.directory)
+    if landmarks is not None:
+        lower, upper = landmarks.bounds(source, target)
+        if lower == math.inf:
+            print("Landmarks show they are not connected.")
+        elif upper is not None:
+            print(f"Landmarks bound the separation between {lower} "
+                  f"and {upper} degrees.")
+
+    search = bidirectional_path if args.bidirectional else shortest_path
+    path = search(source, target)
 
     if path is None:
         print("Not connected.")
@@ -84,6 +337,21 @@ def main():
             print(f"{i + 1}: {person1} and {person2} starred in {movie}")
 
 
+def print_distribution(counts):
+    """
+    Prints a summary and histogram of a Counter returned by distribution.
+    """
+    reached = {degrees: n for degrees, n in counts.items() if degrees}
+    total = sum(reached.values())
+    if total:
+        average = sum(degrees * n for degrees, n in reached.items()) / total
+        print(f"{total} people connected, {average:.2f} degrees away on "
+              f"average, at most {max(reached)}.")
+    for degrees in sorted(reached):
+        print(f"{degrees}: {reached[degrees]}")
+    print(f"{counts[None]} people not connected.")
+
+
 def shortest_path(source, target):
     """
     Returns the shortest list of (movie_id, person_id) pairs
@@ -91,72 +359,147 @@ def shortest_path(source, target):
 
     If no possible path, returns None.
     """
-    # TODO
-    # have to use frontiers and stacks and breadth first search
-    f = QueueFrontier()
+    if graph is not None:
+        return graph.shortest_path(source, target)
 
-    #create a node for the source
-    source_node = Node(source, None, None)
+    if source == target:
+        return []
 
-    #start with a frontier with the intial state
-    #print("starting with intial state")
-    f.add(source_node)
-    explored = []
+    # Breadth first search over person_ids. `parents` maps every person
+    # reached so far, whether expanded yet or still in the frontier, to the
+    # (movie_id, person_id) they were reached through. Each movie is
+    # expanded once, from the first person reaching it: its stars can be
+    # reached no sooner through anyone else in the movie
+    parents = {source: None}
+    expanded = set()
+    frontier = deque([source])
 
-    #check if the frontier is empty
-    while True:
-        #print("checking for empty frontier")
-        if f.empty():
-            #print("empty fronteir")
-            return None
-        #gets a node from the frontier
-        #print("getting node from fronteir")
-        current = f.remove()
-
-        #checkign if the current node is the solution
-        if current.state == target:
-            #return solutions
-            solution = []
-            getSolution(source_node, current, solution)
-            return solution
-
-        #add node to explored set
-        #print("adding node to explored set")
-        explored.append(current)
-
-        #expand node and adds nodes nodes that arn't in explored or forntier to the frotneir
-        #print("expanding node and adding neighbors")
-        neighbors = neighbors_for_person(current.state)
-        for neighbor in neighbors:
-            
-            action = neighbor[0]
-            state = neighbor[1]
-            
-            if state in explored or f.contains_state(state) == True:
-                #print("already explored current neighbor")
+    while frontier:
+        person_id = frontier.popleft()
+
+        # BFS reaches every person first along a shortest path, so the
+        # target can be checked as soon as it is generated
+        for movie_id in people[person_id]["movies"]:
+            if movie_id in expanded:
                 continue
-            else:
-                #print("creatign and adding node for the current state and action to the solution")
-                new_node = Node(state, current, action)
-                f.add(new_node)
-    
-    
-def getSolution(target, current, solution):
-    if current == target:
-        return solution
-    else:
-        solution.insert(0, (current.action, current.state))
-        getSolution(target, current.parent, solution)
+            expanded.add(movie_id)
+            for neighbor in movies[movie_id]["stars"]:
+                if neighbor in parents:
+                    continue
+                parents[neighbor] = (movie_id, person_id)
+                if neighbor == target:
+                    return trace_path(parents, target)
+                frontier.append(neighbor)
+
+    return None
+
+
+def bidirectional_path(source, target):
+    """
+    Returns the same kind of path as shortest_path, searching breadth
+    first from the source and the target at once until the two searches
+    meet, which explores far fewer people between well connected actors.
+
+    If no possible path, returns None.
+    """
+    if graph is not None:
+        return graph.bidirectional_path(source, target)
+
+    if source == target:
+        return []
+
+    # Maps each reached person to the (movie_id, person_id) step leading
+    # back towards the side's starting person, or None for that person
+    forward = {source: None}
+    backward = {target: None}
+    forward_frontier = [source]
+    backward_frontier = [target]
+
+    # Movies each side has expanded
+    forward_movies = set()
+    backward_movies = set()
+
+    while forward_frontier and backward_frontier:
+        # Grow the smaller side by one whole level
+        if len(forward_frontier) <= len(backward_frontier):
+            forward_frontier, meeting = expand_level(
+                forward_frontier, forward, forward_movies, backward
+            )
+        else:
+            backward_frontier, meeting = expand_level(
+                backward_frontier, backward, backward_movies, forward
+            )
+        if meeting is not None:
+            return join_paths(forward, backward, meeting)
+
+    return None
+
+
+def expand_level(frontier, parents, expanded, other):
+    """
+    Expands every person in `frontier` through the movies not yet in
+    `expanded`, recording new people in `parents`. Returns the next level
+    and the first person also reached by the `other` side (or None).
+    """
+    level = []
+    for person_id in frontier:
+        for movie_id in people[person_id]["movies"]:
+            if movie_id in expanded:
+                continue
+            expanded.add(movie_id)
+            for neighbor in movies[movie_id]["stars"]:
+                if neighbor in parents:
+                    continue
+                parents[neighbor] = (movie_id, person_id)
+                if neighbor in other:
+                    return level, neighbor
+                level.append(neighbor)
+    return level, None
+
+
+def join_paths(forward, backward, meeting):
+    """
+    Returns the path from the source through `meeting` to the target.
+    """
+    path = trace_path(forward, meeting)
+    person_id = meeting
+    while backward[person_id] is not None:
+        movie_id, person_id = backward[person_id]
+        path.append((movie_id, person_id))
+    return path
+
+
+def trace_path(parents, person_id):
+    """
+    Returns the (movie_id, person_id) pairs leading to `person_id` from the
+    person a search started at, following `parents` links.
+    """
+    path = []
+    while parents[person_id] is not None:
+        movie_id, parent = parents[person_id]
+        path.append((movie_id, person_id))
+        person_id = parent
+    path.reverse()
+    return path
 
 
 def person_id_for_name(name):
     """
     Returns the IMDB id for a person's name,
-    resolving ambiguities as needed.
+    resolving ambiguities and misspellings as needed.
     """
     person_ids = list(names.get(name.lower(), set()))
     if len(person_ids) == 0:
-        return None
+        person_ids = suggest_names(name)
+        if not person_ids:
+            return None
+        print(f"No one is named '{name}'. Did you mean:")
+        for person_id in person_ids:
+            person = people[person_id]
+            print(f"ID: {person_id}, Name: {person['name']}, "
+                  f"Birth: {person['birth']}")
+        person_id = input("Intended Person ID: ")
+        return person_id if person_id in person_ids else None
     elif len(person_ids) > 1:
         print(f"Which '{name}'?")
         for person_id in person_ids:
@@ -175,11 +518,21 @@ def person_id_for_name(name):
         return person_ids[0]
 
 
+def suggest_names(name, limit=10):
+    """
+    Returns up to `limit` person_ids whose names start with or are close
+    to `name`, best first.
+    """
+    return name_index.suggest(name, limit)
+
+
 def neighbors_for_person(person_id):
     """
     Returns (movie_id, person_id) pairs for people
     who starred with a given person.
     """
+    if graph is not None:
+        return graph.neighbors_for_person(person_id)
     movie_ids = people[person_id]["movies"]
     neighbors = set()
     for movie_id in movie_ids:
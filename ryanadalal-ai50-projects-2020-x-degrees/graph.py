@@ -0,0 +1,628 @@
+import bisect
+import json
+import mmap
+import os
+import struct
+import sys
+
+from array import array
+from collections import deque
+from collections.abc import Mapping, Sequence
+from ingest import load_rows
+from nameindex import NameIndex
+
+# Name of the snapshot file compiled into a data directory
+SNAPSHOT = "degrees.snapshot"
+
+# Snapshot files start with MAGIC and the offset of their JSON header
+MAGIC = b"DEGSNAP\n"
+
+# Fields of a Graph stored in a snapshot as integer arrays and as strings
+INTEGER_FIELDS = (
+    "person_offsets", "person_movies", "movie_offsets", "movie_people",
+    "name_order", "trigram_offsets", "trigram_entries"
+)
+STRING_FIELDS = (
+    "person_ids", "person_names", "person_births", "movie_ids",
+    "movie_titles", "movie_years", "name_keys", "trigrams"
+)
+
+# Fields kept by the graph's name index rather than the graph itself
+NAME_INDEX_FIELDS = ("trigrams", "trigram_offsets", "trigram_entries")
+
+
+class Graph():
+
+    # Bump when the snapshot layout changes, so old snapshots are rebuilt
+    VERSION = 2
+
+    def __init__(self, person_ids, person_names, person_births, movie_ids,
+                 movie_titles, movie_years, person_offsets, person_movies,
+                 movie_offsets, movie_people, name_keys, name_order,
+                 trigrams=None, trigram_offsets=None, trigram_entries=None):
+        """
+        Create an actor-movie graph in which people and movies are numbered
+        densely, in order of their (sorted) IMDb ids.
+
+        The movies of person p are person_movies[person_offsets[p]:
+        person_offsets[p + 1]] and the stars of movie m are, likewise,
+        movie_people[movie_offsets[m]:movie_offsets[m + 1]]. name_keys holds
+        every lowercase name in sorted order, and name_order the person
+        with each of those names. The trigram fields are the postings of
+        the name index, if already built (see NameIndex).
+        """
+        self.person_ids = person_ids
+        self.person_names = person_names
+        self.person_births = person_births
+        self.movie_ids = movie_ids
+        self.movie_titles = movie_titles
+        self.movie_years = movie_years
+        self.person_offsets = person_offsets
+        self.person_movies = person_movies
+        self.movie_offsets = movie_offsets
+        self.movie_people = movie_people
+        self.name_keys = name_keys
+        self.name_order = name_order
+
+        # Views with the shape of the names, people and movies dicts
+        self.names = NameView(self)
+        self.people = PersonView(self)
+        self.movies = MovieView(self)
+
+        self.name_index = NameIndex(
+            name_keys, NamedPeople(self),
+            trigrams, trigram_offsets, trigram_entries
+        )
+
+        # Sizes and modification times of the CSV files this graph was
+        # built from, when loaded from a snapshot
+        self.sources = None
+
+    @classmethod
+    def from_csv(cls, directory, **options):
+        """
+        Build a graph from the people, movies and stars CSV files in
+        `directory`, read with ingest.load_rows and its `options`.
+        """
+        people, movies, stars = load_rows(directory, **options)
+        people = {person_id: (name, birth) for person_id, name, birth in people}
+        movies = {movie_id: (title, year) for movie_id, title, year in movies}
+
+        person_ids = sorted(people)
+        movie_ids = sorted(movies)
+        person_index = {person_id: n for n, person_id in enumerate(person_ids)}
+        movie_index = {movie_id: n for n, movie_id in enumerate(movie_ids)}
+
+        # Stars naming an unknown person or movie are skipped
+        stars = {
+            (person_index.get(person_id), movie_index.get(movie_id))
+            for person_id, movie_id in stars
+        }
+        stars = sorted(
+            (person, movie) for person, movie in stars
+            if person is not None and movie is not None
+        )
+
+        return cls.build(
+            person_ids, [people[person_id] for person_id in person_ids],
+            movie_ids, [movies[movie_id] for movie_id in movie_ids],
+            [person for person, _ in stars], [movie for _, movie in stars]
+        )
+
+    @classmethod
+    def build(cls, person_ids, people, movie_ids, movies, star_people,
+              star_movies):
+        """
+        Build a graph from sorted lists of ids, (name, birth) and (title,
+        year) pairs in the same order, and the person and movie number of
+        each distinct star.
+        """
+        person_offsets, person_movies = compress(
+            len(person_ids), star_people, star_movies
+        )
+        movie_offsets, movie_people = compress(
+            len(movie_ids), star_movies, star_people
+        )
+        names = [name for name, _ in people]
+        keys = sorted((name.lower(), n) for n, name in enumerate(names))
+        return cls(
+            person_ids, names, [birth for _, birth in people],
+            movie_ids, [title for title, _ in movies],
+            [year for _, year in movies],
+            person_offsets, person_movies, movie_offsets, movie_people,
+            [key for key, _ in keys], array("i", (n for _, n in keys))
+        )
+
+    @classmethod
+    def open(cls, filename):
+        """
+        Open a snapshot written by `save`. The file is memory-mapped and
+        the graph's arrays and strings are read from it in place, so
+        opening takes about the same time however large the data is.
+        """
+        with open(filename, "rb") as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if data[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{filename} is not a degrees snapshot")
+        (start,) = struct.unpack_from("<Q", data, len(MAGIC))
+        header = json.loads(data[start:])
+        if header["version"] != cls.VERSION or \
+                header["byteorder"] != sys.byteorder or \
+                header["itemsize"] != array("i").itemsize:
+            raise ValueError(f"{filename} was written by another version")
+
+        view = memoryview(data)
+        fields = dict()
+        for name in INTEGER_FIELDS:
+            offset, count = header["sections"][name]
+            fields[name] = integers(view, offset, count, "i")
+        for name in STRING_FIELDS:
+            offset, count, blob, size = header["sections"][name]
+            fields[name] = StringTable(
+                integers(view, offset, count + 1, "q"), view[blob:blob + size]
+            )
+
+        graph = cls(**fields)
+        graph.sources = header["sources"]
+        return graph
+
+    def save(self, filename, sources=None):
+        """
+        Write the graph to a snapshot file that `open` can map, recording
+        `sources` (see csv_sources) to check the snapshot against later.
+        """
+        self.name_index.build()
+        sections = dict()
+        temporary = f"{filename}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as f:
+            f.write(MAGIC + struct.pack("<Q", 0))
+            for name in INTEGER_FIELDS:
+                values = self.field(name)
+                sections[name] = [
+                    write_section(f, array("i", values)), len(values)
+                ]
+            for name in STRING_FIELDS:
+                strings = [value.encode() for value in self.field(name)]
+                offsets = array("q", [0])
+                for value in strings:
+                    offsets.append(offsets[-1] + len(value))
+                sections[name] = [
+                    write_section(f, offsets), len(strings),
+                    write_section(f, b"".join(strings)), offsets[-1]
+                ]
+
+            start = f.tell()
+            f.write(json.dumps({
+                "version": self.VERSION,
+                "byteorder": sys.byteorder,
+                "itemsize": array("i").itemsize,
+                "sources": sources,
+                "sections": sections
+            }).encode())
+            f.seek(len(MAGIC))
+            f.write(struct.pack("<Q", start))
+        os.replace(temporary, filename)
+
+    def field(self, name):
+        """Returns the value of the snapshot field `name`."""
+        if name in NAME_INDEX_FIELDS:
+            return getattr(self.name_index, name)
+        return getattr(self, name)
+
+    def person(self, person_id):
+        """
+        Returns the number of the person with IMDb id `person_id`, raising
+        KeyError if there is none.
+        """
+        return find(self.person_ids, person_id)
+
+    def movie(self, movie_id):
+        """
+        Returns the number of the movie with IMDb id `movie_id`, raising
+        KeyError if there is none.
+        """
+        return find(self.movie_ids, movie_id)
+
+    def movies_of(self, person):
+        """Returns the numbers of the movies person number `person` is in."""
+        return self.person_movies[
+            self.person_offsets[person]:self.person_offsets[person + 1]
+        ]
+
+    def stars_of(self, movie):
+        """Returns the numbers of the people starring in movie `movie`."""
+        return self.movie_people[
+            self.movie_offsets[movie]:self.movie_offsets[movie + 1]
+        ]
+
+    def people_named(self, name):
+        """
+        Returns the ids of all people whose name is `name`, ignoring case.
+        """
+        key = name.lower()
+        start = bisect.bisect_left(self.name_keys, key)
+        end = bisect.bisect_right(self.name_keys, key, start)
+        return [
+            self.person_ids[self.name_order[n]] for n in range(start, end)
+        ]
+
+    def neighbors_for_person(self, person_id):
+        """
+        Returns (movie_id, person_id) pairs for people
+        who starred with a given person.
+        """
+        neighbors = set()
+        for movie in self.movies_of(self.person(person_id)):
+            movie_id = self.movie_ids[movie]
+            for person in self.stars_of(movie):
+                neighbors.add((movie_id, self.person_ids[person]))
+        return neighbors
+
+    def shortest_path(self, source, target):
+        """
+        Returns the shortest list of (movie_id, person_id) pairs
+        that connect the source to the target.
+
+        If no possible path, returns None.
+        """
+        source = self.person(source)
+        target = self.person(target)
+        if source == target:
+            return []
+
+        # Breadth first search over person numbers, recording for each
+        # reached person the person and movie it was reached from. Each
+        # movie is expanded once, from the first person reaching it
+        parent = array("i", [-1]) * len(self.person_ids)
+        via = array("i", [-1]) * len(self.person_ids)
+        expanded = bytearray(len(self.movie_ids))
+        parent[source] = source
+        person_offsets = self.person_offsets
+        person_movies = self.person_movies
+        movie_offsets = self.movie_offsets
+        movie_people = self.movie_people
+
+        queue = deque([source])
+        while queue:
+            person = queue.popleft()
+            for k in range(person_offsets[person], person_offsets[person + 1]):
+                movie = person_movies[k]
+                if expanded[movie]:
+                    continue
+                expanded[movie] = 1
+                for n in range(movie_offsets[movie], movie_offsets[movie + 1]):
+                    neighbor = movie_people[n]
+                    if parent[neighbor] != -1:
+                        continue
+                    parent[neighbor] = person
+                    via[neighbor] = movie
+                    if neighbor == target:
+                        return self.path(parent, via, source, target)
+                    queue.append(neighbor)
+
+        return None
+
+    def bidirectional_path(self, source, target):
+        """
+        Returns the same path as shortest_path, searching breadth first
+        from the source and the target at once until the two searches meet.
+        """
+        source = self.person(source)
+        target = self.person(target)
+        if source == target:
+            return []
+
+        # For each side: the person and movie each reached person was
+        # reached from, the movies expanded, and the current level
+        sides = []
+        for start in (source, target):
+            parent = array("i", [-1]) * len(self.person_ids)
+            parent[start] = start
+            sides.append((
+                parent, array("i", [-1]) * len(self.person_ids),
+                bytearray(len(self.movie_ids)), [start]
+            ))
+        forward, backward = sides
+
+        while forward[3] and backward[3]:
+            # Grow the smaller side by one whole level
+            side, other = (forward, backward) \
+                if len(forward[3]) <= len(backward[3]) else (backward, forward)
+            meeting = self.expand_level(side, other[0])
+            if meeting is not None:
+                path = self.path(forward[0], forward[1], source, meeting)
+                parent, via = backward[0], backward[1]
+                person = meeting
+                while person != target:
+                    movie = via[person]
+                    person = parent[person]
+                    path.append(
+                        (self.movie_ids[movie], self.person_ids[person])
+                    )
+                return path
+
+        return None
+
+    def expand_level(self, side, other):
+        """
+        Replaces the level of a bidirectional search `side` with the next
+        one. Returns the first person reached who is also in the `other`
+        side's parents (or None).
+        """
+        parent, via, expanded, frontier = side
+        person_offsets = self.person_offsets
+        person_movies = self.person_movies
+        movie_offsets = self.movie_offsets
+        movie_people = self.movie_people
+
+        level = []
+        for person in frontier:
+            for k in range(person_offsets[person], person_offsets[person + 1]):
+                movie = person_movies[k]
+                if expanded[movie]:
+                    continue
+                expanded[movie] = 1
+                for n in range(movie_offsets[movie], movie_offsets[movie + 1]):
+                    neighbor = movie_people[n]
+                    if parent[neighbor] != -1:
+                        continue
+                    parent[neighbor] = person
+                    via[neighbor] = movie
+                    if other[neighbor] != -1:
+                        return neighbor
+                    level.append(neighbor)
+        frontier[:] = level
+        return None
+
+    def distances(self, source):
+        """
+        Returns the degrees of separation of every person from person
+        number `source`, indexed by person number, with -1 for people who
+        are not connected to it.
+        """
+        distance = array("i", [-1]) * len(self.person_ids)
+        distance[source] = 0
+        expanded = bytearray(len(self.movie_ids))
+        person_offsets = self.person_offsets
+        person_movies = self.person_movies
+        movie_offsets = self.movie_offsets
+        movie_people = self.movie_people
+
+        queue = deque([source])
+        while queue:
+            person = queue.popleft()
+            degrees = distance[person] + 1
+            for k in range(person_offsets[person], person_offsets[person + 1]):
+                movie = person_movies[k]
+                if expanded[movie]:
+                    continue
+                expanded[movie] = 1
+                for n in range(movie_offsets[movie], movie_offsets[movie + 1]):
+                    neighbor = movie_people[n]
+                    if distance[neighbor] == -1:
+                        distance[neighbor] = degrees
+                        queue.append(neighbor)
+        return distance
+
+    def path(self, parent, via, source, target):
+        """
+        Returns the (movie_id, person_id) pairs leading from `source` to
+        `target` along the `parent` and `via` links of a search.
+        """
+        path = []
+        person = target
+        while person != source:
+            path.append((self.movie_ids[via[person]], self.person_ids[person]))
+            person = parent[person]
+        path.reverse()
+        return path
+
+
+class StringTable(Sequence):
+
+    def __init__(self, offsets, blob):
+        """
+        Present the UTF-8 strings packed in `blob`, string n running from
+        offsets[n] to offsets[n + 1], as a sequence of str.
+        """
+        self.offsets = offsets
+        self.blob = blob
+
+    def __getitem__(self, n):
+        if isinstance(n, slice):
+            return [self[k] for k in range(*n.indices(len(self)))]
+        if n < 0:
+            n += len(self)
+        if not 0 <= n < len(self):
+            raise IndexError(n)
+        return str(self.blob[self.offsets[n]:self.offsets[n + 1]], "utf-8")
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+
+class NamedPeople(Sequence):
+
+    def __init__(self, graph):
+        """
+        Present the person_ids of `graph` in the order of its name_keys.
+        """
+        self.graph = graph
+
+    def __getitem__(self, n):
+        return self.graph.person_ids[self.graph.name_order[n]]
+
+    def __len__(self):
+        return len(self.graph.name_order)
+
+
+class PersonView(Mapping):
+
+    def __init__(self, graph):
+        """
+        Present the people of `graph` as the people dict of degrees.py:
+        person_id -> {"name", "birth", "movies"}.
+        """
+        self.graph = graph
+
+    def __getitem__(self, person_id):
+        graph = self.graph
+        person = graph.person(person_id)
+        return {
+            "name": graph.person_names[person],
+            "birth": graph.person_births[person],
+            "movies": {
+                graph.movie_ids[movie] for movie in graph.movies_of(person)
+            }
+        }
+
+    def __iter__(self):
+        return iter(self.graph.person_ids)
+
+    def __len__(self):
+        return len(self.graph.person_ids)
+
+
+class MovieView(Mapping):
+
+    def __init__(self, graph):
+        """
+        Present the movies of `graph` as the movies dict of degrees.py:
+        movie_id -> {"title", "year", "stars"}.
+        """
+        self.graph = graph
+
+    def __getitem__(self, movie_id):
+        graph = self.graph
+        movie = graph.movie(movie_id)
+        return {
+            "title": graph.movie_titles[movie],
+            "year": graph.movie_years[movie],
+            "stars": {
+                graph.person_ids[person] for person in graph.stars_of(movie)
+            }
+        }
+
+    def __iter__(self):
+        return iter(self.graph.movie_ids)
+
+    def __len__(self):
+        return len(self.graph.movie_ids)
+
+
+class NameView(Mapping):
+
+    def __init__(self, graph):
+        """
+        Present the names of `graph` as the names dict of degrees.py:
+        lowercase name -> set of person_ids.
+        """
+        self.graph = graph
+
+    def __getitem__(self, name):
+        person_ids = self.graph.people_named(name)
+        if not person_ids or name != name.lower():
+            raise KeyError(name)
+        return set(person_ids)
+
+    def __iter__(self):
+        previous = None
+        for key in self.graph.name_keys:
+            if key != previous:
+                yield key
+            previous = key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+def csv_sources(directory):
+    """
+    Returns the size and modification time of each CSV file in
+    `directory`, which change whenever the data does.
+    """
+    sources = dict()
+    for name in ("people.csv", "movies.csv", "stars.csv"):
+        stat = os.stat(os.path.join(directory, name))
+        sources[name] = [stat.st_size, stat.st_mtime_ns]
+    return sources
+
+
+def compile_snapshot(directory):
+    """
+    Build the graph of the CSV files in `directory`, save it as the
+    directory's snapshot and return it, opened from the snapshot.
+    """
+    filename = os.path.join(directory, SNAPSHOT)
+    Graph.from_csv(directory).save(filename, csv_sources(directory))
+    return Graph.open(filename)
+
+
+def open_snapshot(directory):
+    """
+    Returns the graph saved in the snapshot of `directory`, compiling the
+    snapshot first if there is none or the CSV files have changed since.
+    """
+    filename = os.path.join(directory, SNAPSHOT)
+    try:
+        graph = Graph.open(filename)
+    except (OSError, ValueError):
+        return compile_snapshot(directory)
+    try:
+        sources = csv_sources(directory)
+    except FileNotFoundError:
+        # Only the snapshot was shipped, so there is nothing to compare
+        return graph
+    if graph.sources != sources:
+        return compile_snapshot(directory)
+    return graph
+
+
+def write_section(f, data):
+    """
+    Write the bytes of `data` to `f` at the next multiple of 8 and return
+    the offset they start at.
+    """
+    f.write(b"\0" * (-f.tell() % 8))
+    offset = f.tell()
+    f.write(data)
+    return offset
+
+
+def integers(view, offset, count, typecode):
+    """
+    Returns the `count` integers of type `typecode` stored at `offset` in
+    the memoryview `view`, without copying them.
+    """
+    size = array(typecode).itemsize
+    return view[offset:offset + count * size].cast(typecode)
+
+
+def compress(count, keys, values):
+    """
+    Returns the CSR offsets and indices of the edges keys[n] -> values[n]
+    for keys numbered below `count`, keeping each key's values in order.
+    """
+    offsets = array("i", [0]) * (count + 1)
+    for key in keys:
+        offsets[key + 1] += 1
+    for n in range(count):
+        offsets[n + 1] += offsets[n]
+
+    indices = array("i", [0]) * len(keys)
+    fill = array("i", offsets)
+    for key, value in zip(keys, values):
+        indices[fill[key]] = value
+        fill[key] += 1
+    return offsets, indices
+
+
+def find(sequence, key):
+    """
+    Returns the position of `key` in the sorted `sequence`, raising
+    KeyError if it is not there.
+    """
+    n = bisect.bisect_left(sequence, key)
+    if n == len(sequence) or sequence[n] != key:
+        raise KeyError(key)
+    return n
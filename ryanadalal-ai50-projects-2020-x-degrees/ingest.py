@@ -0,0 +1,195 @@
+import csv
+import os
+import sys
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+from operator import itemgetter
+
+# File and columns of each table, in the order rows are returned; the
+# first column (both, for stars) holds IMDb ids
+TABLES = {
+    "people": ("people.csv", ("id", "name", "birth")),
+    "movies": ("movies.csv", ("id", "title", "year")),
+    "stars": ("stars.csv", ("person_id", "movie_id"))
+}
+
+
+class Progress():
+
+    def __init__(self, label, interval=1.0):
+        """
+        Report the rows read of `label` to stderr, at most once every
+        `interval` seconds.
+        """
+        self.label = label
+        self.interval = interval
+        self.start = self.last = time.perf_counter()
+
+    def update(self, rows):
+        now = time.perf_counter()
+        if now - self.last >= self.interval:
+            self.last = now
+            self.report(rows, now)
+
+    def done(self, rows):
+        self.report(rows, time.perf_counter(), final=True)
+
+    def report(self, rows, now, final=False):
+        seconds = now - self.start
+        rate = rows / seconds if seconds else 0
+        status = "read in" if final else "read so far,"
+        print(f"{self.label}: {rows} rows {status} {seconds:.1f} s "
+              f"({rate:.0f} rows/s)", file=sys.stderr, flush=True)
+
+
+def iter_table(directory, table, progress=False):
+    """
+    Yields the rows of `table` in `directory` one at a time as tuples of
+    its columns (see TABLES), with ids interned so that every copy of an
+    id is one string. Rows too short to hold every column are skipped.
+    """
+    filename, columns = TABLES[table]
+    intern = sys.intern
+    meter = Progress(filename) if progress else None
+    count = 0
+    with open(os.path.join(directory, filename), encoding="utf-8",
+              newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        positions = [header.index(column) for column in columns]
+        width = max(positions) + 1
+        get = itemgetter(*positions)
+        for row in reader:
+            if len(row) < width:
+                continue
+            if table == "stars":
+                person_id, movie_id = get(row)
+                yield intern(person_id), intern(movie_id)
+            else:
+                key, first, second = get(row)
+                yield intern(key), first, second
+            count += 1
+            if meter is not None and count % 100000 == 0:
+                meter.update(count)
+    if meter is not None:
+        meter.done(count)
+
+
+def read_table(directory, table, progress=False):
+    """
+    Returns the rows of `table` in `directory` as a list (see
+    `iter_table`).
+    """
+    return list(iter_table(directory, table, progress))
+
+
+def read_tables(directory, parallel=False, progress=False):
+    """
+    Returns the rows of the people, movies and stars tables, read one after
+    the other or, if `parallel`, each in its own process.
+    """
+    if not parallel:
+        return [
+            read_table(directory, table, progress) for table in TABLES
+        ]
+
+    with ProcessPoolExecutor(len(TABLES)) as pool:
+        futures = [
+            pool.submit(read_table, directory, table, progress)
+            for table in TABLES
+        ]
+        people, movies, stars = [future.result() for future in futures]
+
+    # Interning does not cross processes: make the copies of each id in
+    # the three tables one string again
+    intern = sys.intern
+    people = [(intern(key), name, birth) for key, name, birth in people]
+    movies = [(intern(key), title, year) for key, title, year in movies]
+    stars = [(intern(person), intern(movie)) for person, movie in stars]
+    return [people, movies, stars]
+
+
+def neighborhood(stars, seeds, hops):
+    """
+    Returns the sets of person_ids and movie_ids within `hops` degrees of
+    the `seeds` (person_ids): every movie a person fewer than `hops`
+    degrees away starred in, and all of its stars.
+    """
+    movies_of = dict()
+    stars_of = dict()
+    for person_id, movie_id in stars:
+        movies_of.setdefault(person_id, []).append(movie_id)
+        stars_of.setdefault(movie_id, []).append(person_id)
+
+    people = set(seeds)
+    movies = set()
+    frontier = list(people)
+    for _ in range(hops):
+        level = []
+        for person_id in frontier:
+            for movie_id in movies_of.get(person_id, ()):
+                if movie_id in movies:
+                    continue
+                movies.add(movie_id)
+                for neighbor in stars_of[movie_id]:
+                    if neighbor not in people:
+                        people.add(neighbor)
+                        level.append(neighbor)
+        frontier = level
+    return people, movies
+
+
+def seed_ids(people, seeds):
+    """
+    Returns the person_ids of the `seeds`, each an IMDb id or a name (which
+    selects everyone with that name), given the rows of the people table.
+    Raises LookupError for a seed matching nobody.
+    """
+    by_name = dict()
+    ids = set()
+    for person_id, name, _ in people:
+        ids.add(person_id)
+        by_name.setdefault(name.lower(), set()).add(person_id)
+
+    found = set()
+    for seed in seeds:
+        if seed in ids:
+            found.add(seed)
+        elif seed.lower() in by_name:
+            found.update(by_name[seed.lower()])
+        else:
+            raise LookupError(f"no person {seed}")
+    return found
+
+
+def load_rows(directory, parallel=False, progress=False, seeds=None,
+              hops=2):
+    """
+    Returns the (person_id, name, birth), (movie_id, title, year) and
+    (person_id, movie_id) rows of the CSV files in `directory`. If `seeds`
+    are given, only the people and movies within `hops` degrees of them
+    are returned.
+
+    Read serially and in full, each table is streamed straight from its
+    file, so its rows must be consumed once and in order: people, then
+    movies, then stars. Otherwise they are lists.
+    """
+    if not parallel and not seeds:
+        return [iter_table(directory, table, progress) for table in TABLES]
+
+    people, movies, stars = read_tables(directory, parallel, progress)
+    if seeds:
+        keep_people, keep_movies = neighborhood(
+            stars, seed_ids(people, seeds), hops
+        )
+        people = [row for row in people if row[0] in keep_people]
+        movies = [row for row in movies if row[0] in keep_movies]
+        stars = [
+            row for row in stars
+            if row[0] in keep_people and row[1] in keep_movies
+        ]
+        if progress:
+            print(f"Kept {len(people)} people and {len(movies)} movies "
+                  f"within {hops} degrees of the seeds", file=sys.stderr)
+    return people, movies, stars
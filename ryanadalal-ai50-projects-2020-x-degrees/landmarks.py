@@ -0,0 +1,116 @@
+import json
+import math
+import os
+import sys
+
+from array import array
+from graph import find
+
+# Name of the landmark table saved into a data directory
+LANDMARKS = "degrees.landmarks"
+
+
+class Landmarks():
+
+    # Bump when the file layout changes, so old tables are rebuilt
+    VERSION = 1
+
+    def __init__(self, person_ids, landmarks, table, sources=None):
+        """
+        Create a distance oracle from breadth first searches run from each
+        of the `landmarks` (person_ids). People are numbered by their
+        position in the sorted sequence `person_ids`, and the separation
+        of person p from landmark k is table[k * len(person_ids) + p], or
+        -1 if they are not connected.
+        """
+        self.person_ids = person_ids
+        self.landmarks = landmarks
+        self.table = table
+        self.sources = sources
+
+    @classmethod
+    def build(cls, person_ids, landmarks, separations, sources=None,
+              numbered=False):
+        """
+        Build the table for `landmarks`, where separations(person_id)
+        returns a dict mapping every person connected to person_id to
+        their degrees of separation. If `numbered`, it instead returns
+        everyone's separation indexed by their position in `person_ids`,
+        with -1 for people who are not connected, which is copied straight
+        into the table.
+        """
+        count = len(person_ids)
+        table = array("h", [-1]) * (len(landmarks) * count)
+        for k, landmark in enumerate(landmarks):
+            if numbered:
+                table[k * count:(k + 1) * count] = array("h", (
+                    min(degrees, 2 ** 15 - 1)
+                    for degrees in separations(landmark)
+                ))
+                continue
+            for person_id, degrees in separations(landmark).items():
+                table[k * count + find(person_ids, person_id)] = \
+                    min(degrees, 2 ** 15 - 1)
+        return cls(person_ids, landmarks, table, sources)
+
+    @classmethod
+    def open(cls, filename, person_ids):
+        """
+        Read a table written by `save` for the people `person_ids`, or
+        raise ValueError if it was written for other data or by another
+        version.
+        """
+        with open(filename, "rb") as f:
+            header = json.loads(f.readline())
+            if header["version"] != cls.VERSION or \
+                    header["byteorder"] != sys.byteorder or \
+                    header["people"] != len(person_ids):
+                raise ValueError(f"{filename} was written for other data")
+            table = array("h")
+            table.fromfile(f, len(header["landmarks"]) * len(person_ids))
+        return cls(person_ids, header["landmarks"], table, header["sources"])
+
+    def save(self, filename):
+        """
+        Write the table to `filename`: a line of JSON describing it,
+        followed by the raw distances.
+        """
+        temporary = f"{filename}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as f:
+            f.write(json.dumps({
+                "version": self.VERSION,
+                "byteorder": sys.byteorder,
+                "people": len(self.person_ids),
+                "landmarks": self.landmarks,
+                "sources": self.sources
+            }).encode() + b"\n")
+            self.table.tofile(f)
+        os.replace(temporary, filename)
+
+    def distances(self, person_id):
+        """
+        Returns the separation of `person_id` from each landmark, with -1
+        for landmarks it is not connected to.
+        """
+        count = len(self.person_ids)
+        person = find(self.person_ids, person_id)
+        return [
+            self.table[k * count + person] for k in range(len(self.landmarks))
+        ]
+
+    def bounds(self, source, target):
+        """
+        Returns (lower, upper) bounds on the degrees of separation between
+        `source` and `target`, by the triangle inequality through each
+        landmark. upper is None if no landmark reaches both; both are
+        math.inf if a landmark reaches only one, so they are not connected.
+        """
+        lower, upper = 0, None
+        for s, t in zip(self.distances(source), self.distances(target)):
+            if s == -1 and t == -1:
+                continue
+            if s == -1 or t == -1:
+                return math.inf, math.inf
+            lower = max(lower, abs(s - t))
+            upper = s + t if upper is None else min(upper, s + t)
+        return lower, upper
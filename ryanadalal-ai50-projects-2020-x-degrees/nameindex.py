@@ -0,0 +1,141 @@
+import bisect
+
+from array import array
+from collections import Counter
+
+
+class NameIndex():
+
+    def __init__(self, keys, person_ids, trigrams=None, trigram_offsets=None,
+                 trigram_entries=None):
+        """
+        Create an index of the lowercase names `keys`, in sorted order,
+        where `person_ids[n]` is the person named keys[n].
+
+        Fuzzy lookups use the trigram postings: the positions in `keys` of
+        the names containing trigrams[t] are trigram_entries[
+        trigram_offsets[t]:trigram_offsets[t + 1]]. They are built on first
+        use unless given (as when loaded from a snapshot).
+        """
+        self.keys = keys
+        self.person_ids = person_ids
+        self.trigrams = trigrams
+        self.trigram_offsets = trigram_offsets
+        self.trigram_entries = trigram_entries
+
+    @classmethod
+    def from_names(cls, names):
+        """
+        Build an index of the names dict of degrees.py: lowercase name ->
+        set of person_ids.
+        """
+        pairs = sorted(
+            (key, person_id)
+            for key, person_ids in names.items()
+            for person_id in person_ids
+        )
+        return cls([key for key, _ in pairs], [pid for _, pid in pairs])
+
+    def build(self):
+        """Build the trigram postings, if they were not given."""
+        if self.trigrams is not None:
+            return
+        postings = dict()
+        for n, key in enumerate(self.keys):
+            for trigram in trigrams_of(key):
+                postings.setdefault(trigram, []).append(n)
+        self.trigrams = sorted(postings)
+        self.trigram_offsets = array("i", [0])
+        self.trigram_entries = array("i")
+        for trigram in self.trigrams:
+            self.trigram_entries.extend(postings[trigram])
+            self.trigram_offsets.append(len(self.trigram_entries))
+
+    def prefix(self, text, limit=10):
+        """
+        Returns up to `limit` person_ids whose names start with `text`,
+        ignoring case, in name order.
+        """
+        text = text.lower()
+        matches = []
+        n = bisect.bisect_left(self.keys, text)
+        while n < len(self.keys) and len(matches) < limit and \
+                self.keys[n].startswith(text):
+            matches.append(self.person_ids[n])
+            n += 1
+        return matches
+
+    def fuzzy(self, text, limit=10, distance=None):
+        """
+        Returns up to `limit` (person_id, edit distance) pairs for the names
+        closest to `text`, ignoring case, and no more than `distance` edits
+        away (by default, a third of the length of `text`). Candidates are
+        the names sharing the most trigrams with `text`.
+        """
+        self.build()
+        text = text.lower()
+        if distance is None:
+            distance = max(1, len(text) // 3)
+
+        shared = Counter()
+        for trigram in trigrams_of(text):
+            t = bisect.bisect_left(self.trigrams, trigram)
+            if t == len(self.trigrams) or self.trigrams[t] != trigram:
+                continue
+            shared.update(self.trigram_entries[
+                self.trigram_offsets[t]:self.trigram_offsets[t + 1]
+            ])
+
+        matches = []
+        for n, _ in shared.most_common(max(4 * limit, 50)):
+            edits = edit_distance(text, self.keys[n], distance)
+            if edits is not None:
+                matches.append((edits, self.keys[n], self.person_ids[n]))
+        matches.sort()
+        return [(person_id, edits) for edits, _, person_id in matches[:limit]]
+
+    def suggest(self, text, limit=10):
+        """
+        Returns up to `limit` person_ids for `text`: exact matches first,
+        then names starting with it, then the closest names.
+        """
+        suggestions = self.prefix(text, limit)
+        if len(suggestions) >= limit:
+            return suggestions
+        for person_id, _ in self.fuzzy(text, limit):
+            if len(suggestions) == limit:
+                break
+            if person_id not in suggestions:
+                suggestions.append(person_id)
+        return suggestions
+
+
+def trigrams_of(text):
+    """
+    Returns the set of three-character substrings of `text`, padded so the
+    start and end of the name count as well.
+    """
+    padded = f"  {text} "
+    return {padded[n:n + 3] for n in range(len(padded) - 2)}
+
+
+def edit_distance(a, b, bound):
+    """
+    Returns the Levenshtein distance between `a` and `b`, or None if it is
+    greater than `bound`.
+    """
+    if abs(len(a) - len(b)) > bound:
+        return None
+    previous = list(range(len(b) + 1))
+    for i, x in enumerate(a, 1):
+        current = [i]
+        for j, y in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (x != y)
+            ))
+        if min(current) > bound:
+            return None
+        previous = current
+    return previous[-1] if previous[-1] <= bound else None
@@ -0,0 +1,280 @@
+import argparse
+import json
+import os
+import socketserver
+import sys
+import time
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import degrees
+
+
+class PersonNotFound(LookupError):
+
+    def __init__(self, person, candidates=(), suggested=False):
+        """
+        Raised when `person` names more than one person (the
+        `candidates`), or nobody, in which case the `candidates` are
+        people with similar names.
+        """
+        super().__init__(person)
+        self.person = person
+        self.candidates = list(candidates)
+        self.suggested = suggested
+
+
+def resolve(person):
+    """
+    Returns the person_id for `person`, which may be an IMDb id or a name.
+    Raises PersonNotFound unless exactly one person matches, with the
+    people of that name or, if there are none, suggested people.
+    """
+    if person in degrees.people:
+        return person
+    person_ids = sorted(degrees.names.get(person.lower(), set()))
+    if len(person_ids) == 1:
+        return person_ids[0]
+    if not person_ids:
+        raise PersonNotFound(
+            person, degrees.suggest_names(person), suggested=True
+        )
+    raise PersonNotFound(person, person_ids)
+
+
+def answer(task):
+    """
+    Answers one (source, target, bidirectional) query with a dict holding
+    the degrees of separation, the path and the time taken, or an error.
+    """
+    source, target, bidirectional = task
+    start = time.perf_counter()
+    result = {"source": source, "target": target}
+    try:
+        source_id = resolve(source)
+        target_id = resolve(target)
+        if bidirectional:
+            path = degrees.bidirectional_path(source_id, target_id)
+        else:
+            path = degrees.shortest_path(source_id, target_id)
+    except PersonNotFound as e:
+        if e.suggested:
+            result["error"] = f"person not found: {e.person}"
+        else:
+            result["error"] = f"ambiguous name: {e.person}"
+        if e.candidates:
+            key = "suggestions" if e.suggested else "candidates"
+            result[key] = [
+                describe_person(person_id) for person_id in e.candidates
+            ]
+    else:
+        result["degrees"] = None if path is None else len(path)
+        result["path"] = None if path is None else [
+            {
+                "movie_id": movie_id,
+                "movie": degrees.movies[movie_id]["title"],
+                "person_id": person_id,
+                "person": degrees.people[person_id]["name"]
+            }
+            for movie_id, person_id in path
+        ]
+    result["seconds"] = round(time.perf_counter() - start, 6)
+    return result
+
+
+def describe_person(person_id):
+    """Returns the id, name and birth year of a person as a dict."""
+    person = degrees.people[person_id]
+    return {"id": person_id, "name": person["name"], "birth": person["birth"]}
+
+
+def parse_query(line):
+    """
+    Returns the (source, target) of one query line: either a JSON object
+    with "source" and "target" keys or two names separated by a tab.
+    Returns None for blank and comment lines.
+    """
+    line = line.strip()
+    if not line or line.startswith("#"):
+        return None
+    if line.startswith("{"):
+        query = json.loads(line)
+        return str(query["source"]), str(query["target"])
+    source, target = line.split("\t")
+    return source.strip(), target.strip()
+
+
+def executor(args):
+    """
+    Returns the pool queries are answered in: worker processes if
+    --processes was given (so searches run on several cores), else
+    threads.
+    """
+    if args.processes:
+        return ProcessPoolExecutor(
+            args.workers, initializer=degrees.load_worker,
+            initargs=(args.directory, args.backend)
+        )
+    return ThreadPoolExecutor(args.workers)
+
+
+def run_batch(pool, lines, output, bidirectional):
+    """
+    Answer every query in `lines`, writing one JSON result per line to
+    `output` in input order. Returns the number of queries answered.
+    """
+    # Each entry is a task to answer, or the result for a bad line
+    entries = []
+    for line in lines:
+        try:
+            query = parse_query(line)
+        except (ValueError, KeyError):
+            entries.append({"error": f"bad query: {line.strip()}"})
+            continue
+        if query is not None:
+            entries.append((*query, bidirectional))
+
+    tasks = [entry for entry in entries if isinstance(entry, tuple)]
+    results = pool.map(answer, tasks, chunksize=16)
+    for entry in entries:
+        result = next(results) if isinstance(entry, tuple) else entry
+        output.write(json.dumps(result) + "\n")
+        output.flush()
+    return len(tasks)
+
+
+class Handler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        """GET /path?source=...&target=... answers one query."""
+        url = urlparse(self.path)
+        if url.path != "/path":
+            return self.reply(404, {"error": "not found"})
+        params = parse_qs(url.query)
+        if "source" not in params or "target" not in params:
+            return self.reply(400, {"error": "source and target required"})
+        task = (params["source"][0], params["target"][0],
+                self.server.bidirectional)
+        self.reply(200, self.server.pool.submit(answer, task).result())
+
+    def do_POST(self):
+        """POST /paths with a JSON list of queries answers all of them."""
+        if urlparse(self.path).path != "/paths":
+            return self.reply(404, {"error": "not found"})
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            tasks = [
+                (str(query["source"]), str(query["target"]),
+                 self.server.bidirectional)
+                for query in json.loads(self.rfile.read(length))
+            ]
+        except (ValueError, KeyError, TypeError):
+            return self.reply(400, {"error": "expected a list of queries"})
+        self.reply(200, list(self.server.pool.map(answer, tasks)))
+
+    def reply(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class LineHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        """
+        Answer each query line sent over the socket with a JSON result
+        line, until the client closes its end.
+        """
+        for line in self.rfile:
+            try:
+                query = parse_query(line.decode("utf-8"))
+            except (ValueError, KeyError):
+                result = {"error": "bad query"}
+            else:
+                if query is None:
+                    continue
+                task = (*query, self.server.bidirectional)
+                result = self.server.pool.submit(answer, task).result()
+            self.wfile.write(json.dumps(result).encode() + b"\n")
+            self.wfile.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Answer many degrees of separation queries, loading "
+                    "the data only once."
+    )
+    parser.add_argument("directory", nargs="?", default="large")
+    degrees.add_backend_argument(parser)
+    parser.add_argument("--bidirectional", action="store_true",
+                        help="search from both people at once")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--batch", metavar="FILE",
+                      help="answer the queries in FILE (default: stdin), one "
+                           "per line as 'source<TAB>target' or JSON")
+    mode.add_argument("--port", type=int,
+                      help="serve GET /path?source=&target= and POST /paths "
+                           "over HTTP on localhost")
+    mode.add_argument("--socket", metavar="PATH",
+                      help="serve query lines over a Unix socket")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="number of queries answered at once")
+    parser.add_argument("--processes", action="store_true",
+                        help="answer queries in worker processes instead of "
+                             "threads")
+    parser.add_argument("--verbose", action="store_true",
+                        help="log every HTTP request")
+    args = parser.parse_args()
+
+    args.backend = degrees.default_backend(args.directory, args.backend)
+
+    print("Loading data...", file=sys.stderr)
+    degrees.load_data(args.directory, args.backend)
+    print("Data loaded.", file=sys.stderr)
+
+    with executor(args) as pool:
+        if args.port is not None or args.socket is not None:
+            if args.port is not None:
+                server = ThreadingHTTPServer(("127.0.0.1", args.port), Handler)
+                where = f"http://127.0.0.1:{args.port}"
+            else:
+                server = socketserver.ThreadingUnixStreamServer(
+                    args.socket, LineHandler
+                )
+                where = args.socket
+            server.pool = pool
+            server.bidirectional = args.bidirectional
+            server.verbose = args.verbose
+            print(f"Serving on {where}", file=sys.stderr)
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                pass
+            finally:
+                server.server_close()
+                if args.socket is not None:
+                    os.unlink(args.socket)
+            return
+
+        start = time.perf_counter()
+        if args.batch is None or args.batch == "-":
+            count = run_batch(pool, sys.stdin, sys.stdout, args.bidirectional)
+        else:
+            with open(args.batch, encoding="utf-8") as f:
+                count = run_batch(pool, f, sys.stdout, args.bidirectional)
+        seconds = time.perf_counter() - start
+        print(f"{count} queries in {seconds:.3f} s "
+              f"({count / seconds:.1f} queries/s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()